@@ -62,6 +62,11 @@ class App extends Component {
 
     let csrfToken = document.querySelector("[name=csrfmiddlewaretoken]").value;
 
+    // The same key on every retry lets the server drop duplicate orders
+    if (!this.checkoutKey){
+      this.checkoutKey = Date.now().toString(36) + Math.random().toString(36).slice(2);
+    }
+
     try {
       let response = await fetch(url, {
         method: 'post',
@@ -69,6 +74,7 @@ class App extends Component {
           'Accept': 'application/json',
           'Content-Type': 'application/json',
           'X-CSRFToken': csrfToken,
+          'Idempotency-Key': this.checkoutKey,
         },
         body: JSON.stringify(data),
       });
@@ -78,6 +84,7 @@ class App extends Component {
         return;
       }
       let responseData = await response.json();
+      this.checkoutKey = null;
 
       this.setState({
         cart: [],
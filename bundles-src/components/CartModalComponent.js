@@ -26,7 +26,16 @@ class CartModalComponent extends Component{
     let cartItems = this.props.cartItems.map(product => (
       <CSSTransition classNames="fadeIn" key={product.id} timeout={{ enter:500, exit: 300 }}>
         <tr>
-          <td><img src={product.image} style={imgStyle} /></td>
+          <td>
+            {product.thumbnails ? (
+              <picture>
+                <source srcSet={product.thumbnails.small.webp} type="image/webp"/>
+                <img src={product.thumbnails.small.jpeg} style={imgStyle} />
+              </picture>
+            ) : (
+              <img src={product.image} style={imgStyle} />
+            )}
+          </td>
           <td>{product.name}</td>
           <td className="currency">{product.price}</td>
           <td>{product.quantity} шт.</td>
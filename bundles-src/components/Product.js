@@ -42,10 +42,18 @@ class Product extends Component{
     let name = this.props.product.name;
     let price = this.props.product.price;
     let id = this.props.product.id;
+    let thumbnail = this.props.product.thumbnails && this.props.product.thumbnails.medium;
     return (
       <div className="product">
         <div className="product-image">
-          <img src={image} alt={name} onClick={this.quickView.bind(this)}/>
+          {thumbnail ? (
+            <picture>
+              <source srcSet={thumbnail.webp} type="image/webp"/>
+              <img src={thumbnail.jpeg} alt={name} loading="lazy" onClick={this.quickView.bind(this)}/>
+            </picture>
+          ) : (
+            <img src={image} alt={name} loading="lazy" onClick={this.quickView.bind(this)}/>
+          )}
         </div>
         <h4 className="product-name">{name}</h4>
         <p className="product-price currency">{price}</p>
@@ -1,6 +1,11 @@
+from django import forms
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.forms.models import BaseInlineFormSet
 from django.shortcuts import reverse, redirect
 from django.templatetags.static import static
+from django.utils.functional import cached_property
 from django.utils.html import format_html
 from django.utils.http import url_has_allowed_host_and_scheme
 
@@ -10,6 +15,9 @@ from .models import Restaurant
 from .models import RestaurantMenuItem
 from .models import OrderItem
 from .models import Order
+from .availability import set_availability
+from .loads import change_load
+from .thumbnails import get_thumbnail_urls
 
 
 class RestaurantMenuItemInline(admin.TabularInline):
@@ -58,6 +66,10 @@ class ProductAdmin(admin.ModelAdmin):
     inlines = [
         RestaurantMenuItemInline
     ]
+    actions = [
+        'make_unavailable',
+        'make_available',
+    ]
     fieldsets = (
         ('Общее', {
             'fields': [
@@ -100,32 +112,177 @@ class ProductAdmin(admin.ModelAdmin):
         if not obj.image or not obj.id:
             return 'нет картинки'
         edit_url = reverse('admin:foodcartapp_product_change', args=(obj.id,))
-        return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=obj.image.url)
+        thumbnails = get_thumbnail_urls(obj.image_hash)
+        if not thumbnails:
+            return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=obj.image.url)
+        return format_html(
+            '<a href="{edit_url}"><picture>'
+            '<source srcset="{webp}" type="image/webp"/>'
+            '<img src="{jpeg}" style="max-height: 50px;" loading="lazy"/>'
+            '</picture></a>',
+            edit_url=edit_url,
+            webp=thumbnails['small']['webp'],
+            jpeg=thumbnails['small']['jpeg'],
+        )
     get_image_list_preview.short_description = 'превью'
 
+    @admin.action(description='Снять с продажи во всех ресторанах')
+    def make_unavailable(self, request, queryset):
+        updated_count = set_availability(queryset.values_list('id', flat=True), False)
+        self.message_user(request, f'Позиций в меню снято с продажи: {updated_count}')
+
+    @admin.action(description='Вернуть в продажу во всех ресторанах')
+    def make_available(self, request, queryset):
+        updated_count = set_availability(queryset.values_list('id', flat=True), True)
+        self.message_user(request, f'Позиций в меню возвращено в продажу: {updated_count}')
+
 
 @admin.register(ProductCategory)
 class ProductAdmin(admin.ModelAdmin):
     pass
 
 
+class PrefetchedProductField(forms.ModelChoiceField):
+    """Resolve the submitted product from products loaded by the formset."""
+
+    prefetched = None
+
+    def to_python(self, value):
+        if self.prefetched is not None and value not in self.empty_values:
+            try:
+                return self.prefetched[int(value)]
+            except (KeyError, ValueError, TypeError):
+                pass
+        return super().to_python(value)
+
+
+class OrderItemForm(forms.ModelForm):
+    def clean_product(self):
+        product = self.cleaned_data['product']
+        prefetched = self.fields['product'].prefetched
+        # The formset has loaded every submitted product in one query
+        self.instance.product_checked = bool(prefetched) and prefetched.get(product.pk) is product
+        return product
+
+
+class OrderItemFormSet(BaseInlineFormSet):
+    @cached_property
+    def submitted_products(self):
+        """Load every product named in the submitted rows with one query."""
+        product_ids = set()
+        for number in range(self.total_form_count()):
+            value = self.data.get(f'{self.add_prefix(number)}-product')
+            if value and str(value).isdigit():
+                product_ids.add(int(value))
+        return Product.objects.in_bulk(product_ids)
+
+    @cached_property
+    def product_choices(self):
+        """Product options shared by every row instead of a query per select."""
+        return list(self.form.base_fields['product'].choices)
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        product_field = form.fields['product']
+        if self.is_bound:
+            product_field.prefetched = self.submitted_products
+        else:
+            product_field.choices = self.product_choices
+            # The admin wraps the select to add the "+" link, the inner widget renders the options
+            if hasattr(product_field.widget, 'widget'):
+                product_field.widget.widget.choices = self.product_choices
+        return form
+
+
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
+    form = OrderItemForm
+    formset = OrderItemFormSet
     extra = 0
     fields = ['product', 'quantity', 'price']
     readonly_fields = ['price']
 
+    def get_queryset(self, request):
+        # Rows are titled with OrderItem.__str__, which reads the product name
+        return super().get_queryset(request).select_related('product')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'product':
+            kwargs['form_class'] = PrefetchedProductField
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class ApproximateCountPaginator(Paginator):
+    """Paginator that never counts more than `count_limit` rows.
+
+    An unfiltered PostgreSQL table is sized from the planner statistics.
+    Otherwise counting stops at the limit, and pages past it are reached by
+    narrowing the list with filters or the date hierarchy.
+    """
+
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        capped_count = queryset.order_by()[:self.count_limit + 1].count()
+        if capped_count <= self.count_limit:
+            return capped_count
+
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+                estimate, = cursor.fetchone()
+            return max(estimate, capped_count)
+        return self.count_limit
+
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     inlines = [OrderItemInline]
+    list_display = [
+        'id',
+        'registered_at',
+        'status',
+        'payment_method',
+        'total_price',
+        'lastname',
+        'phonenumber',
+        'address',
+        'restaurant',
+    ]
+    list_select_related = ['restaurant']
+    list_filter = [
+        'status',
+        'payment_method',
+    ]
+    date_hierarchy = 'registered_at'
+    ordering = ['-registered_at', '-id']
+    show_full_result_count = False
+    paginator = ApproximateCountPaginator
 
     def save_formset(self, request, form, formset, change):
+        order = form.instance
+        quantity_before = order.get_items_quantity()
+
         instances = formset.save(commit=False)
+        if formset.deleted_objects:
+            OrderItem.objects.filter(pk__in=[item.pk for item in formset.deleted_objects]).delete()
+
+        # Products were loaded once by OrderItemFormSet, so reading prices costs no queries
         for instance in instances:
             instance.price = instance.product.price
-            instance.save()
+        new_items = [instance for instance in instances if instance._state.adding]
+        changed_items = [instance for instance in instances if not instance._state.adding]
+        OrderItem.objects.bulk_create(new_items)
+        OrderItem.objects.bulk_update(changed_items, ['product', 'quantity', 'price'])
         formset.save_m2m()
+        order.update_total_price()
+        change_load(order.get_load_key(), items=order.get_items_quantity() - quantity_before)
 
     def response_change(self, request, obj):
         next_url = request.GET.get("next")
@@ -137,7 +294,41 @@ class OrderAdmin(admin.ModelAdmin):
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ['order', 'product', 'quantity', 'price', ]
+    list_select_related = ['order', 'product']
     raw_id_fields = ['order', 'product']
+    ordering = ['-id']
+    show_full_result_count = False
+    paginator = ApproximateCountPaginator
+
+    def get_orders(self, order_ids):
+        """Load the orders with their current items quantity."""
+        orders = Order.objects.in_bulk(order_ids)
+        for order in orders.values():
+            order.quantity_before = order.get_items_quantity()
+        return orders
+
+    def refresh_orders(self, orders):
+        for order in orders.values():
+            order.update_total_price()
+            change_load(order.get_load_key(), items=order.get_items_quantity() - order.quantity_before)
+
+    def save_model(self, request, obj, form, change):
+        order_ids = {obj.order_id}
+        if change:
+            order_ids.add(form.initial['order'])
+        orders = self.get_orders(order_ids)
+        super().save_model(request, obj, form, change)
+        self.refresh_orders(orders)
+
+    def delete_model(self, request, obj):
+        orders = self.get_orders({obj.order_id})
+        super().delete_model(request, obj)
+        self.refresh_orders(orders)
+
+    def delete_queryset(self, request, queryset):
+        orders = self.get_orders(set(queryset.values_list('order_id', flat=True)))
+        super().delete_queryset(request, queryset)
+        self.refresh_orders(orders)
 
 
 
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class FoodcartappConfig(AppConfig):
     default_auto_field = 'django.db.models.AutoField'
     name = 'foodcartapp'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .phones import preload_phone_metadata
+
+        preload_phone_metadata()
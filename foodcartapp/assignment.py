@@ -0,0 +1,120 @@
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from geocoordapp.distances import distance_matrix
+from geocoordapp.models import Place
+
+from .availability import attach_available_restaurants
+from .caching import ORDERS_VERSION, bump_version_on_commit
+from .loads import add_assigned_orders, get_restaurant_loads
+from .locator import get_restaurant_locator
+from .models import Order
+
+
+def plan_assignments(order_points, candidates, restaurant_points, capacity, loads=None,
+                     load_penalty=0):
+    """Greedily match orders to the nearest restaurants that still have capacity.
+
+    `order_points` and `restaurant_points` map ids to (lat, lon), `candidates`
+    maps an order id to the restaurant ids able to cook it and `loads` to the
+    number of orders restaurants already have. Each order already in progress
+    makes a restaurant look `load_penalty` km farther. Returns {order_id: restaurant_id}.
+    """
+    order_ids = list(order_points)
+    restaurant_ids = list(restaurant_points)
+    if not order_ids or not restaurant_ids:
+        return {}
+
+    columns = {restaurant_id: column for column, restaurant_id in enumerate(restaurant_ids)}
+    distances = distance_matrix(
+        [order_points[order_id] for order_id in order_ids],
+        [restaurant_points[restaurant_id] for restaurant_id in restaurant_ids],
+    )
+
+    feasible = np.zeros(distances.shape, dtype=bool)
+    for row, order_id in enumerate(order_ids):
+        feasible[row, [columns[id_] for id_ in candidates.get(order_id, ()) if id_ in columns]] = True
+
+    loads = loads or {}
+    restaurant_loads = np.array([loads.get(restaurant_id, 0) for restaurant_id in restaurant_ids])
+    costs = distances + load_penalty * restaurant_loads[np.newaxis, :]
+
+    rows, cols = np.nonzero(feasible)
+    pair_order = np.argsort(costs[rows, cols], kind='stable')
+
+    remaining = capacity - restaurant_loads
+    assigned = np.zeros(len(order_ids), dtype=bool)
+
+    assignments = {}
+    for row, col in zip(rows[pair_order].tolist(), cols[pair_order].tolist()):
+        if assigned[row] or remaining[col] <= 0:
+            continue
+        assigned[row] = True
+        remaining[col] -= 1
+        assignments[order_ids[row]] = restaurant_ids[col]
+        if len(assignments) == len(order_ids):
+            break
+
+    return assignments
+
+
+def assign_orders(batch_size=None, capacity=None):
+    """Hand the oldest accepted orders over to restaurants, return how many were assigned."""
+    capacity = capacity or settings.ASSIGNMENT_RESTAURANT_CAPACITY
+
+    orders = list(
+        Order.objects
+        .filter(status='accepted', restaurant__isnull=True)
+        .only('id', 'address')
+        .prefetch_related('items')
+        .order_by('registered_at', 'id')[:batch_size]
+    )
+    attach_available_restaurants(orders)
+
+    places = Place.objects.lookup({order.address for order in orders})
+    order_points = {}
+    for order in orders:
+        status, place = places[order.address]
+        if place and place.is_located:
+            order_points[order.id] = place.coordinates
+
+    locator = get_restaurant_locator()
+    assignments = plan_assignments(
+        order_points,
+        {order.id: order.available_restaurant_ids for order in orders},
+        locator.points,
+        capacity,
+        loads={
+            restaurant_id: load.orders_in_progress
+            for restaurant_id, load in get_restaurant_loads().items()
+        },
+        load_penalty=settings.RESTAURANT_LOAD_PENALTY_KM,
+    )
+
+    orders_by_restaurant = {}
+    for order_id, restaurant_id in assignments.items():
+        orders_by_restaurant.setdefault(restaurant_id, []).append(order_id)
+
+    now = timezone.now()
+    with transaction.atomic():
+        for restaurant_id, order_ids in orders_by_restaurant.items():
+            # Skip orders a manager took while the plan was being computed
+            orders_by_restaurant[restaurant_id] = list(
+                Order.objects.select_for_update()
+                .filter(id__in=order_ids, status='accepted', restaurant__isnull=True)
+                .values_list('id', flat=True)
+            )
+            Order.objects.filter(id__in=orders_by_restaurant[restaurant_id]).update(
+                restaurant_id=restaurant_id,
+                status='in_progress',
+                updated_at=now,
+            )
+        add_assigned_orders(orders_by_restaurant)
+
+    assigned_count = sum(len(order_ids) for order_ids in orders_by_restaurant.values())
+
+    if assigned_count:
+        bump_version_on_commit(ORDERS_VERSION)
+    return assigned_count
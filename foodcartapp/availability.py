@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .caching import bump_version_on_commit, get_version
+from .catalog import CATALOG_VERSION
+from .models import RestaurantMenuItem
+
+
+AVAILABILITY_VERSION = 'availability'
+
+_local_indexes = {}
+
+
+class AvailabilityMatrix:
+    """Menu availability as one bitmap per restaurant.
+
+    Bit `product_positions[product_id]` of `bitmaps[restaurant_id]` is set when
+    the restaurant has the product available. Products missing from every menu
+    have no position and are unavailable everywhere.
+    """
+
+    def __init__(self, product_positions, bitmaps):
+        self.product_positions = product_positions
+        self.bitmaps = bitmaps
+
+    def is_available(self, restaurant_id, product_id):
+        position = self.product_positions.get(product_id)
+        if position is None:
+            return False
+        return bool(self.bitmaps.get(restaurant_id, 0) >> position & 1)
+
+    def get_row(self, product_id, restaurant_ids):
+        position = self.product_positions.get(product_id)
+        if position is None:
+            return [False] * len(restaurant_ids)
+        return [bool(self.bitmaps.get(restaurant_id, 0) >> position & 1) for restaurant_id in restaurant_ids]
+
+
+def build_product_restaurants():
+    product_restaurants = {}
+    menu_items = (
+        RestaurantMenuItem.objects
+        .filter(availability=True)
+        .values_list('product_id', 'restaurant_id')
+    )
+    for product_id, restaurant_id in menu_items:
+        product_restaurants.setdefault(product_id, set()).add(restaurant_id)
+
+    return {
+        product_id: frozenset(restaurant_ids)
+        for product_id, restaurant_ids in product_restaurants.items()
+    }
+
+
+def build_availability_matrix():
+    product_positions = {}
+    bitmaps = {}
+    menu_items = RestaurantMenuItem.objects.values_list('product_id', 'restaurant_id', 'availability')
+    for product_id, restaurant_id, availability in menu_items.iterator(chunk_size=10000):
+        position = product_positions.setdefault(product_id, len(product_positions))
+        if availability:
+            bitmaps[restaurant_id] = bitmaps.get(restaurant_id, 0) | 1 << position
+
+    return AvailabilityMatrix(product_positions, bitmaps)
+
+
+def get_index(name, build):
+    """Return an index built from menus, cached until the next menu change."""
+    version = get_version(AVAILABILITY_VERSION)
+    local_version, index = _local_indexes.get(name, (None, None))
+    if local_version == version:
+        return index
+
+    cache_key = f'availability:{name}:{version}'
+    index = cache.get(cache_key)
+    if index is None:
+        index = build()
+        cache.set(cache_key, index, timeout=settings.AVAILABILITY_CACHE_TIMEOUT)
+
+    _local_indexes[name] = version, index
+    return index
+
+
+def get_product_restaurants():
+    """Return a mapping of product id to ids of restaurants that sell it."""
+    return get_index('products', build_product_restaurants)
+
+
+def get_availability_matrix():
+    return get_index('matrix', build_availability_matrix)
+
+
+def attach_available_restaurants(orders):
+    """Set `available_restaurant_ids` of every order to restaurants selling all its items."""
+    product_restaurants = get_product_restaurants()
+
+    for order in orders:
+        available_restaurants = []
+
+        for item in order.items.all():
+            item_restaurants = product_restaurants.get(item.product_id, frozenset())
+            item.available_restaurants = list(item_restaurants)
+            available_restaurants.append(item_restaurants)
+
+        if available_restaurants:
+            order.available_restaurant_ids = list(frozenset.intersection(*available_restaurants))
+        else:
+            order.available_restaurant_ids = []
+
+
+def set_availability(product_ids, available, restaurant_ids=None):
+    """Switch the products in restaurant menus on or off with one UPDATE.
+
+    Only menu items that already exist are changed. Without `restaurant_ids`
+    every restaurant is affected. Returns the number of changed items.
+    """
+    menu_items = RestaurantMenuItem.objects.filter(product_id__in=product_ids).exclude(availability=available)
+    if restaurant_ids is not None:
+        menu_items = menu_items.filter(restaurant_id__in=restaurant_ids)
+
+    updated_count = menu_items.update(availability=available)
+    if updated_count:
+        # update() sends no signals, so invalidate once for the whole batch
+        bump_version_on_commit(CATALOG_VERSION)
+        bump_version_on_commit(AVAILABILITY_VERSION)
+    return updated_count
@@ -0,0 +1,35 @@
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+ORDERS_VERSION = 'orders'
+
+
+def get_version(name):
+    key = f'version:{name}'
+    version = cache.get(key)
+    if version is None:
+        # Start from a timestamp so a flushed cache never reissues old versions
+        version = int(time.time() * 1000)
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(name):
+    try:
+        return cache.incr(f'version:{name}')
+    except ValueError:
+        return get_version(name)
+
+
+def bump_version_on_commit(name):
+    """Bump the version once the current transaction commits, or right away outside one.
+
+    Bumping earlier lets a concurrent reader rebuild the cached payload from
+    uncommitted data and store it under the new version.
+    """
+    transaction.on_commit(partial(bump_version, name))
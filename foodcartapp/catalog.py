@@ -0,0 +1,56 @@
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .caching import get_version
+from .models import Product
+from .thumbnails import get_thumbnail_urls
+
+
+CATALOG_VERSION = 'catalog'
+
+
+def serialize_catalog():
+    products = Product.objects.select_related('category').available()
+
+    dumped_products = []
+    for product in products:
+        dumped_product = {
+            'id': product.id,
+            'name': product.name,
+            'price': product.price,
+            'special_status': product.special_status,
+            'description': product.description,
+            'category': {
+                'id': product.category.id,
+                'name': product.category.name,
+            } if product.category else None,
+            'image': product.image.url,
+            'thumbnails': get_thumbnail_urls(product.image_hash),
+            'restaurant': {
+                'id': product.id,
+                'name': product.name,
+            }
+        }
+        dumped_products.append(dumped_product)
+
+    return json.dumps(
+        dumped_products,
+        cls=DjangoJSONEncoder,
+        ensure_ascii=False,
+        separators=(',', ':'),
+    ).encode()
+
+
+def get_catalog():
+    version = get_version(CATALOG_VERSION)
+    cache_key = f'catalog:{version}'
+
+    payload = cache.get(cache_key)
+    if payload is None:
+        payload = serialize_catalog()
+        cache.set(cache_key, payload, timeout=settings.CATALOG_CACHE_TIMEOUT)
+
+    return version, payload
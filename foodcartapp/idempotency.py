@@ -0,0 +1,74 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import OrderSubmission
+from .phones import ORDER_PHONE_REGION, to_e164
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def get_submission_key(request):
+    """Return a hashed dedup key and its lifetime in seconds, or (None, None).
+
+    A client-supplied Idempotency-Key wins. Without it a retry is recognised by
+    the same order body within a short window, so a resubmission with a
+    corrected address or name is a new order rather than a conflict.
+    """
+    client_key = request.headers.get(IDEMPOTENCY_HEADER, '').strip()
+    if client_key:
+        source = f'client:{client_key}'
+        ttl = settings.ORDER_IDEMPOTENCY_TTL
+    else:
+        data = request.data
+        try:
+            phonenumber = str(data['phonenumber'])
+        except (KeyError, TypeError):
+            return None, None
+        phonenumber = to_e164(phonenumber, ORDER_PHONE_REGION) or phonenumber
+        source = 'payload:' + get_payload_hash({**data, 'phonenumber': phonenumber})
+        ttl = settings.ORDER_DUPLICATE_WINDOW
+
+    if not ttl:
+        return None, None
+    return hashlib.sha256(source.encode()).hexdigest(), ttl
+
+
+def get_payload_hash(data):
+    """Hash the request body so that key order and cart order do not matter."""
+    if isinstance(data, dict) and isinstance(data.get('products'), list):
+        data = {
+            **data,
+            'products': sorted(data['products'], key=lambda item: json.dumps(item, sort_keys=True, default=str)),
+        }
+    canonical = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def claim_submission(key, ttl, payload_hash=''):
+    """Reserve the key. Return (submission, created).
+
+    A concurrent request with the same key waits on the unique index until the
+    first one commits and then gets its stored row.
+    """
+    now = timezone.now()
+    OrderSubmission.objects.filter(expires_at__lte=now).delete()
+    return OrderSubmission.objects.get_or_create(
+        key=key,
+        defaults={'expires_at': now + timedelta(seconds=ttl), 'payload_hash': payload_hash},
+    )
+
+
+def is_same_payload(submission, payload_hash):
+    # Submissions stored before payload hashes existed match any body
+    return not submission.payload_hash or submission.payload_hash == payload_hash
+
+
+def store_response(submission, order, response):
+    submission.order = order
+    submission.response = response
+    submission.save(update_fields=['order', 'response'])
@@ -0,0 +1,78 @@
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Order, OrderItem, RestaurantLoad
+
+
+def change_load(restaurant_id, orders=0, items=0):
+    if not restaurant_id or not (orders or items):
+        return
+
+    RestaurantLoad.objects.get_or_create(restaurant_id=restaurant_id)
+    RestaurantLoad.objects.filter(restaurant_id=restaurant_id).update(
+        orders_in_progress=Greatest(F('orders_in_progress') + orders, 0),
+        items_in_progress=Greatest(F('items_in_progress') + items, 0),
+    )
+
+
+def track_order_load(order):
+    """Move the order's share of load when it enters or leaves a restaurant's assembly."""
+    loaded_key = order.get_loaded_load_key()
+    current_key = order.get_load_key()
+    if loaded_key == current_key:
+        return
+
+    items = order.get_items_quantity()
+    change_load(loaded_key, orders=-1, items=-items)
+    change_load(current_key, orders=1, items=items)
+    order.loaded_load_key = current_key
+
+
+def add_assigned_orders(orders_by_restaurant):
+    """Account for orders moved to in_progress with a bulk UPDATE."""
+    order_ids = [order_id for order_ids in orders_by_restaurant.values() for order_id in order_ids]
+    quantities = dict(
+        OrderItem.objects
+        .filter(order_id__in=order_ids)
+        .values('order_id')
+        .annotate(quantity=Sum('quantity'))
+        .values_list('order_id', 'quantity')
+    )
+    for restaurant_id, order_ids in orders_by_restaurant.items():
+        change_load(
+            restaurant_id,
+            orders=len(order_ids),
+            items=sum(quantities.get(order_id, 0) for order_id in order_ids),
+        )
+
+
+def get_restaurant_loads(restaurant_ids=None):
+    loads = RestaurantLoad.objects.all()
+    if restaurant_ids is not None:
+        loads = loads.filter(restaurant_id__in=restaurant_ids)
+    return {load.restaurant_id: load for load in loads}
+
+
+def recount_restaurant_loads():
+    """Rebuild every counter from scratch, e.g. after manual changes in the database."""
+    loads = (
+        Order.objects
+        .filter(status='in_progress', restaurant__isnull=False)
+        .values('restaurant_id')
+        .annotate(
+            orders=Count('id', distinct=True),
+            items=Coalesce(Sum('items__quantity'), 0),
+        )
+    )
+
+    with transaction.atomic():
+        RestaurantLoad.objects.all().delete()
+        RestaurantLoad.objects.bulk_create([
+            RestaurantLoad(
+                restaurant_id=load['restaurant_id'],
+                orders_in_progress=load['orders'],
+                items_in_progress=load['items'],
+            )
+            for load in loads
+        ])
@@ -0,0 +1,141 @@
+import heapq
+
+import numpy as np
+
+from geocoordapp.distances import EARTH_RADIUS_KM
+from geocoordapp.models import Place
+from geocoordapp.normalization import normalize_address
+
+from .caching import get_version
+from .models import Restaurant
+
+
+LOCATIONS_VERSION = 'restaurant_locations'
+LEAF_SIZE = 8
+
+_local_locator = {}
+
+
+def to_unit_vectors(points):
+    """Project (lat, lon) pairs onto the unit sphere, where chords order like arcs."""
+    points = np.radians(np.asarray(points, dtype=float).reshape(-1, 2))
+    lats, lons = points[:, 0], points[:, 1]
+    return np.column_stack([
+        np.cos(lats) * np.cos(lons),
+        np.cos(lats) * np.sin(lons),
+        np.sin(lats),
+    ])
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+class KDTree:
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.root = self.build(np.arange(len(vectors)))
+
+    def build(self, indices):
+        if len(indices) <= LEAF_SIZE:
+            return None, None, indices, None
+
+        points = self.vectors[indices]
+        axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+        indices = indices[np.argsort(points[:, axis], kind='stable')]
+        middle = len(indices) // 2
+        split = self.vectors[indices[middle], axis]
+        return axis, split, self.build(indices[:middle]), self.build(indices[middle:])
+
+    def query(self, vector, k, accept):
+        """Return up to k (chord, index) pairs nearest to vector among accepted indices."""
+        best = []
+
+        def visit(node):
+            axis, split, left, right = node
+            if axis is None:
+                for index in left:
+                    if not accept(index):
+                        continue
+                    chord = float(np.linalg.norm(self.vectors[index] - vector))
+                    if len(best) < k:
+                        heapq.heappush(best, (-chord, index))
+                    elif chord < -best[0][0]:
+                        heapq.heapreplace(best, (-chord, index))
+                return
+
+            offset = vector[axis] - split
+            near, far = (left, right) if offset < 0 else (right, left)
+            visit(near)
+            if len(best) < k or abs(offset) < -best[0][0]:
+                visit(far)
+
+        visit(self.root)
+        return sorted((-chord, index) for chord, index in best)
+
+
+class RestaurantLocator:
+    def __init__(self, restaurant_points, address_points=None):
+        self.points = dict(restaurant_points)
+        # Coordinates taken for every normalized restaurant address, None if not located
+        self.address_points = dict(address_points or {})
+        self.restaurant_ids = list(restaurant_points)
+        self.vectors = to_unit_vectors([restaurant_points[id_] for id_ in self.restaurant_ids])
+        self.positions = {id_: position for position, id_ in enumerate(self.restaurant_ids)}
+        self.tree = KDTree(self.vectors)
+
+    def __contains__(self, restaurant_id):
+        return restaurant_id in self.positions
+
+    def is_outdated_by(self, place):
+        """Whether the index must be rebuilt after `place` was saved."""
+        if place.normalized_address not in self.address_points:
+            return False
+        coordinates = place.coordinates if place.is_located else None
+        return self.address_points[place.normalized_address] != coordinates
+
+    def nearest(self, point, k=None, among=None):
+        """Return [(restaurant_id, km)] for the k nearest located restaurants.
+
+        `among` limits the search to the given restaurant ids, e.g. to those
+        that have every product of an order on their menu.
+        """
+        if among is not None:
+            positions = [self.positions[id_] for id_ in among if id_ in self.positions]
+        else:
+            positions = range(len(self.restaurant_ids))
+
+        vector = to_unit_vectors([point])[0]
+        if k is None or len(positions) <= k:
+            chords = np.linalg.norm(self.vectors[list(positions)] - vector, axis=1)
+            found = sorted(zip(chords.tolist(), positions))[:k]
+        else:
+            accepted = set(positions)
+            found = self.tree.query(vector, k, accepted.__contains__)
+
+        return [
+            (self.restaurant_ids[position], float(chord_to_km(chord)))
+            for chord, position in found
+        ]
+
+
+def build_restaurant_locator():
+    restaurant_addresses = dict(Restaurant.objects.exclude(address='').values_list('id', 'address'))
+    places = Place.objects.lookup(set(restaurant_addresses.values()))
+
+    restaurant_points = {}
+    address_points = {}
+    for restaurant_id, address in restaurant_addresses.items():
+        status, place = places[address]
+        coordinates = place.coordinates if place and place.is_located else None
+        address_points[normalize_address(address)] = coordinates
+        if coordinates:
+            restaurant_points[restaurant_id] = coordinates
+    return RestaurantLocator(restaurant_points, address_points)
+
+
+def get_restaurant_locator():
+    version = get_version(LOCATIONS_VERSION)
+    if _local_locator.get('version') != version:
+        _local_locator.update(version=version, locator=build_restaurant_locator())
+    return _local_locator['locator']
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodcartapp.assignment import assign_orders
+
+
+class Command(BaseCommand):
+    help = 'Передаёт необработанные заказы ближайшим ресторанам, у которых есть свободные мощности'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--capacity', type=int, help='сколько заказов в сборке может быть у ресторана')
+        parser.add_argument('--interval', type=float, help='повторять раз в столько секунд')
+
+    def handle(self, *args, **options):
+        while True:
+            assigned_count = assign_orders(
+                batch_size=options['batch_size'],
+                capacity=options['capacity'],
+            )
+            self.stdout.write(f'Назначено заказов: {assigned_count}')
+
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,141 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from foodcartapp.assignment import assign_orders, plan_assignments
+from foodcartapp.availability import AVAILABILITY_VERSION
+from foodcartapp.caching import bump_version
+from foodcartapp.catalog import CATALOG_VERSION
+from foodcartapp.loads import recount_restaurant_loads
+from foodcartapp.locator import LOCATIONS_VERSION
+from foodcartapp.models import Order, OrderItem, Product, Restaurant, RestaurantMenuItem
+from geocoordapp.models import Place
+from geocoordapp.normalization import normalize_address
+
+
+def seed_orders(random_point, generator, orders_count, restaurants_count, coverage):
+    """Fill the database with located restaurants and accepted one-item orders.
+
+    Each restaurant has the ordered product on its menu with `coverage` probability.
+    """
+    products = Product.objects.bulk_create([
+        Product(name=f'Блюдо {number}', price=100, image='burger.jpg')
+        for number in range(10)
+    ])
+    restaurants = Restaurant.objects.bulk_create([
+        Restaurant(name=f'Ресторан {number}', address=f'Москва, ресторан {number}')
+        for number in range(restaurants_count)
+    ])
+    RestaurantMenuItem.objects.bulk_create([
+        RestaurantMenuItem(restaurant=restaurant, product=product)
+        for restaurant in restaurants
+        for product in products
+        if generator.random() < coverage
+    ], batch_size=1000)
+
+    orders = Order.objects.bulk_create([
+        Order(
+            firstname='Иван',
+            lastname=f'Клиент {number}',
+            phonenumber='+79123456789',
+            address=f'Москва, клиент {number}',
+        )
+        for number in range(orders_count)
+    ], batch_size=1000)
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=generator.choice(products), quantity=1, price=100)
+        for order in orders
+    ], batch_size=1000)
+
+    addresses = [restaurant.address for restaurant in restaurants] + [order.address for order in orders]
+    places = []
+    for address in addresses:
+        lat, lon = random_point()
+        places.append(Place(address=address, normalized_address=normalize_address(address), lat=lat, lon=lon))
+    Place.objects.bulk_create(places, batch_size=1000)
+
+    recount_restaurant_loads()
+    for version in [CATALOG_VERSION, AVAILABILITY_VERSION, LOCATIONS_VERSION]:
+        bump_version(version)
+
+
+class Command(BaseCommand):
+    help = 'Замеряет скорость распределения заказов по ресторанам на синтетических данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=10000)
+        parser.add_argument('--restaurants', type=int, default=200)
+        parser.add_argument('--capacity', type=int, default=60)
+        parser.add_argument('--coverage', type=float, default=0.7, help='доля ресторанов, способных выполнить заказ')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--database',
+            action='store_true',
+            help='заполнить временную тестовую базу и замерить весь запуск assign_orders с запросами к БД',
+        )
+        parser.add_argument('--batch-size', type=int, default=None, help='заказов за один запуск assign_orders')
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+
+        def random_point():
+            return generator.uniform(55.5, 56), generator.uniform(37.3, 37.9)
+
+        if options['database']:
+            self.benchmark_database(random_point, generator, options)
+            return
+
+        restaurant_points = {id_: random_point() for id_ in range(options['restaurants'])}
+        order_points = {id_: random_point() for id_ in range(options['orders'])}
+        candidates = {
+            order_id: [
+                restaurant_id for restaurant_id in restaurant_points
+                if generator.random() < options['coverage']
+            ]
+            for order_id in order_points
+        }
+
+        started_at = time.perf_counter()
+        assignments = plan_assignments(order_points, candidates, restaurant_points, options['capacity'])
+        duration = time.perf_counter() - started_at
+
+        self.stdout.write(
+            f'Заказов: {options["orders"]}, ресторанов: {options["restaurants"]}, '
+            f'назначено: {len(assignments)}, время: {duration:.3f} с, '
+            f'{options["orders"] / duration:.0f} заказов/с'
+        )
+
+    def benchmark_database(self, random_point, generator, options):
+        setup_test_environment()
+        old_database_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # A private cache keeps version bumps away from the running site
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'benchmark',
+            }}):
+                seed_orders(random_point, generator, options['orders'], options['restaurants'], options['coverage'])
+
+                with CaptureQueriesContext(connection) as queries:
+                    started_at = time.perf_counter()
+                    assigned_count = assign_orders(batch_size=options['batch_size'], capacity=options['capacity'])
+                    duration = time.perf_counter() - started_at
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(
+            f'Заказов: {options["orders"]}, ресторанов: {options["restaurants"]}, '
+            f'назначено: {assigned_count}, время: {duration:.3f} с, '
+            f'запросов к БД: {len(queries)}, '
+            f'время в БД: {sum(float(query["time"]) for query in queries):.3f} с'
+        )
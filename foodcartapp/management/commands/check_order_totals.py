@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+from django.utils import timezone
+
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Сверяет сохранённую стоимость заказов с суммой их позиций'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='пересчитать неверные суммы')
+
+    def handle(self, *args, **options):
+        mismatched_orders = list(
+            Order.objects.with_computed_total()
+            .exclude(total_price=F('computed_total'))
+            .values_list('id', 'total_price', 'computed_total')
+        )
+
+        for order_id, total_price, computed_total in mismatched_orders:
+            self.stdout.write(f'Заказ {order_id}: сохранено {total_price}, по позициям {computed_total}')
+            if options['fix']:
+                Order.objects.filter(id=order_id).update(
+                    total_price=computed_total,
+                    updated_at=timezone.now(),
+                )
+
+        if mismatched_orders and not options['fix']:
+            raise CommandError(f'Расхождений: {len(mismatched_orders)}')
+
+        self.stdout.write(f'Проверка завершена, расхождений: {len(mismatched_orders)}')
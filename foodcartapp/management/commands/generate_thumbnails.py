@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.caching import bump_version_on_commit
+from foodcartapp.catalog import CATALOG_VERSION
+from foodcartapp.models import Product
+from foodcartapp.thumbnails import UNREADABLE_IMAGE, generate_thumbnails, read_image
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии картинок товаров, загруженных раньше'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересчитать картинки, у которых копии уже есть',
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='')
+        if not options['force']:
+            products = products.filter(image_hash='')
+
+        updated_count = 0
+        unreadable_count = 0
+        for product in products.only('id', 'image', 'image_hash').iterator():
+            content = read_image(product.image)
+            image_hash = (generate_thumbnails(content) if content else '') or UNREADABLE_IMAGE
+            if image_hash == UNREADABLE_IMAGE:
+                unreadable_count += 1
+            if image_hash != product.image_hash:
+                # update() skips the pre_save signal and the cache bump per product
+                Product.objects.filter(id=product.id).update(image_hash=image_hash)
+                updated_count += 1
+
+        if updated_count:
+            bump_version_on_commit(CATALOG_VERSION)
+        self.stdout.write(f'Обновлено товаров: {updated_count}, не найдено или не прочитано картинок: {unreadable_count}')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.loads import recount_restaurant_loads
+from foodcartapp.models import RestaurantLoad
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает загрузку ресторанов по заказам в сборке'
+
+    def handle(self, *args, **options):
+        recount_restaurant_loads()
+        self.stdout.write(f'Загрузка пересчитана для ресторанов: {RestaurantLoad.objects.count()}')
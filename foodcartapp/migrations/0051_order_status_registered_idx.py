@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0050_alter_orderitem_product'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'registered_at', 'id'], name='order_status_registered_idx'),
+        ),
+    ]
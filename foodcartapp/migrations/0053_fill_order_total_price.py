@@ -0,0 +1,32 @@
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_total_price(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    OrderItem = apps.get_model('foodcartapp', 'OrderItem')
+
+    item_totals = (
+        OrderItem.objects
+        .filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(total=Sum(F('quantity') * F('price')))
+        .values('total')
+    )
+    Order.objects.update(total_price=Coalesce(
+        Subquery(item_totals),
+        0,
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0052_order_total_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_total_price, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0054_order_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantLoad',
+            fields=[
+                ('restaurant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='load', serialize=False, to='foodcartapp.restaurant', verbose_name='ресторан')),
+                ('orders_in_progress', models.PositiveIntegerField(default=0, verbose_name='заказов в сборке')),
+                ('items_in_progress', models.PositiveIntegerField(default=0, verbose_name='позиций в сборке')),
+            ],
+            options={
+                'verbose_name': 'загрузка ресторана',
+                'verbose_name_plural': 'загрузка ресторанов',
+            },
+        ),
+    ]
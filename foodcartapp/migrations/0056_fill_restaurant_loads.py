@@ -0,0 +1,37 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_restaurant_loads(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    RestaurantLoad = apps.get_model('foodcartapp', 'RestaurantLoad')
+
+    loads = (
+        Order.objects
+        .filter(status='in_progress', restaurant__isnull=False)
+        .values('restaurant_id')
+        .annotate(
+            orders=Count('id', distinct=True),
+            items=Coalesce(Sum('items__quantity'), 0),
+        )
+    )
+    RestaurantLoad.objects.bulk_create([
+        RestaurantLoad(
+            restaurant_id=load['restaurant_id'],
+            orders_in_progress=load['orders'],
+            items_in_progress=load['items'],
+        )
+        for load in loads
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0055_restaurantload'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_restaurant_loads, migrations.RunPython.noop),
+    ]
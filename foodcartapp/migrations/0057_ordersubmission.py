@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0056_fill_restaurant_loads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSubmission',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='ключ повтора')),
+                ('response', models.JSONField(blank=True, null=True, verbose_name='ответ')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='хранить до')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='foodcartapp.order', verbose_name='заказ')),
+            ],
+            options={
+                'verbose_name': 'отправка заказа',
+                'verbose_name_plural': 'отправки заказов',
+            },
+        ),
+    ]
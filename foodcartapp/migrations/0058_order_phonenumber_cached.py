@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:19
+
+import foodcartapp.phones
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0057_ordersubmission'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='phonenumber',
+            field=foodcartapp.phones.CachedPhoneNumberField(db_index=True, max_length=128, region=None, verbose_name='Номер телефона'),
+        ),
+    ]
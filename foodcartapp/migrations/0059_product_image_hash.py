@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0058_order_phonenumber_cached'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_hash',
+            field=models.CharField(blank=True, editable=False, max_length=32, verbose_name='хэш картинки'),
+        ),
+    ]
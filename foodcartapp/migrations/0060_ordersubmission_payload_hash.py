@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0059_product_image_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordersubmission',
+            name='payload_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='хэш запроса'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0060_ordersubmission_payload_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedOrder',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.PositiveIntegerField(verbose_name='заказ')),
+                ('deleted_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='дата удаления')),
+            ],
+            options={
+                'verbose_name': 'удалённый заказ',
+                'verbose_name_plural': 'удалённые заказы',
+            },
+        ),
+    ]
@@ -1,8 +1,10 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.utils import timezone
-from phonenumber_field.modelfields import PhoneNumberField
-from django.db.models import F, Prefetch, Sum
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .phones import CachedPhoneNumberField
 
 
 class Restaurant(models.Model):
@@ -29,6 +31,31 @@ class Restaurant(models.Model):
         return self.name
 
 
+class RestaurantLoad(models.Model):
+    restaurant = models.OneToOneField(
+        Restaurant,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='load',
+        verbose_name='ресторан',
+    )
+    orders_in_progress = models.PositiveIntegerField(
+        'заказов в сборке',
+        default=0,
+    )
+    items_in_progress = models.PositiveIntegerField(
+        'позиций в сборке',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'загрузка ресторана'
+        verbose_name_plural = 'загрузка ресторанов'
+
+    def __str__(self):
+        return f"{self.restaurant_id}: {self.orders_in_progress}"
+
+
 class ProductQuerySet(models.QuerySet):
     def available(self):
         products = (
@@ -75,6 +102,12 @@ class Product(models.Model):
     image = models.ImageField(
         'картинка'
     )
+    image_hash = models.CharField(
+        'хэш картинки',
+        max_length=32,
+        blank=True,
+        editable=False,
+    )
     special_status = models.BooleanField(
         'спец.предложение',
         default=False,
@@ -127,52 +160,20 @@ class RestaurantMenuItem(models.Model):
 
 
 class OrderQuerySet(models.QuerySet):
-    def total_price(self):
-        return (
-            self.prefetch_related(
-                Prefetch(
-                    'items',
-                    queryset=OrderItem.objects.select_related('product')
-                )
-            )
-            .annotate(
-                total_price=Sum(
-                    F('items__quantity') * F('items__price')
-                )
+    def with_computed_total(self):
+        return self.annotate(
+            computed_total=Coalesce(
+                Sum(F('items__quantity') * F('items__price')),
+                Value(0),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
             )
         )
 
     def with_available_restaurants(self):
-        orders = self
-        if not orders:
-            return orders
+        from .availability import attach_available_restaurants
 
-        restaurants_items = RestaurantMenuItem.objects.filter(
-            availability=True
-        ).select_related('restaurant', 'product')
-
-        product_restaurants = {}
-        for item in restaurants_items:
-            if item.product_id not in product_restaurants:
-                product_restaurants[item.product_id] = []
-            product_restaurants[item.product_id].append(item.restaurant)
-
-        for order in orders:
-            order.available_restaurants = []
-            available_restaurants = []
-
-            for item in order.items.all():
-                item_restaurants = product_restaurants.get(item.product_id, [])
-                item.available_restaurants = [r.id for r in item_restaurants]
-                available_restaurants.append(item.available_restaurants)
-
-            if available_restaurants:
-                common_restaurants = list(set.intersection(*[set(arr) for arr in available_restaurants]))
-                order.available_restaurant_ids = common_restaurants
-            else:
-                order.available_restaurant_ids = []
-
-        return orders
+        attach_available_restaurants(self)
+        return self
 
 
 class Order(models.Model):
@@ -194,7 +195,7 @@ class Order(models.Model):
         verbose_name='Фамилия',
         max_length=20
     )
-    phonenumber = PhoneNumberField(
+    phonenumber = CachedPhoneNumberField(
         verbose_name='Номер телефона',
         db_index=True
     )
@@ -244,16 +245,69 @@ class Order(models.Model):
         blank=True,
         null=True
     )
+    total_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        verbose_name='Стоимость заказа',
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+        db_index=True,
+    )
 
     objects = OrderQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
+        indexes = [
+            models.Index(fields=['status', 'registered_at', 'id'], name='order_status_registered_idx'),
+        ]
 
     def __str__(self):
         return f"{self.firstname} {self.lastname} {self.address}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if not instance.get_deferred_fields() & {'status', 'restaurant_id'}:
+            instance.loaded_load_key = instance.get_load_key()
+        return instance
+
+    def get_load_key(self):
+        """Return the restaurant whose load the order counts towards, if any."""
+        if self.status == 'in_progress' and self.restaurant_id:
+            return self.restaurant_id
+        return None
+
+    def get_loaded_load_key(self):
+        """Return the load key the order has in the database.
+
+        Orders loaded with `status` or `restaurant` deferred look it up with
+        a query, so it has to be called before they are saved.
+        """
+        if not hasattr(self, 'loaded_load_key'):
+            self.loaded_load_key = None
+            if not self._state.adding:
+                stored = Order.objects.filter(pk=self.pk).values_list('status', 'restaurant_id').first()
+                if stored and stored[0] == 'in_progress':
+                    self.loaded_load_key = stored[1]
+        return self.loaded_load_key
+
+    def get_items_quantity(self):
+        return self.items.aggregate(quantity=Coalesce(Sum('quantity'), 0))['quantity']
+
+    def update_total_price(self):
+        self.total_price = (
+            Order.objects.with_computed_total()
+            .values_list('computed_total', flat=True)
+            .get(pk=self.pk)
+        )
+        self.save(update_fields=['total_price', 'updated_at'])
+
 
 class OrderItem(models.Model):
     order = models.ForeignKey(
@@ -286,3 +340,64 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
+
+    def clean_fields(self, exclude=None):
+        # Skip the existence query for a product already loaded by the admin formset
+        if getattr(self, 'product_checked', False):
+            exclude = {*(exclude or []), 'product'}
+        super().clean_fields(exclude=exclude)
+
+
+class OrderSubmission(models.Model):
+    key = models.CharField(
+        'ключ повтора',
+        max_length=64,
+        unique=True,
+    )
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        verbose_name='заказ',
+        related_name='submissions',
+    )
+    payload_hash = models.CharField(
+        'хэш запроса',
+        max_length=64,
+        blank=True,
+    )
+    response = models.JSONField(
+        'ответ',
+        null=True,
+        blank=True,
+    )
+    expires_at = models.DateTimeField(
+        'хранить до',
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'отправка заказа'
+        verbose_name_plural = 'отправки заказов'
+
+    def __str__(self):
+        return self.key
+
+
+class DeletedOrder(models.Model):
+    order_id = models.PositiveIntegerField(
+        'заказ',
+    )
+    deleted_at = models.DateTimeField(
+        'дата удаления',
+        default=timezone.now,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'удалённый заказ'
+        verbose_name_plural = 'удалённые заказы'
+
+    def __str__(self):
+        return f'{self.order_id} {self.deleted_at}'
@@ -0,0 +1,77 @@
+from functools import lru_cache
+
+import phonenumbers
+from django.conf import settings
+from phonenumber_field.modelfields import PhoneNumberDescriptor, PhoneNumberField
+from phonenumber_field.phonenumber import PhoneNumber, to_python
+
+
+PHONE_CACHE_SIZE = 4096
+ORDER_PHONE_REGION = 'RU'
+
+
+class CachedPhoneNumber(PhoneNumber):
+    """A parsed number that checks its validity only once."""
+
+    valid = None
+
+    def is_valid(self):
+        if self.valid is None:
+            self.valid = super().is_valid()
+        return self.valid
+
+
+@lru_cache(maxsize=PHONE_CACHE_SIZE)
+def parse_cached(raw_number, region):
+    try:
+        phone_number = CachedPhoneNumber.from_string(raw_number, region=region)
+    except phonenumbers.NumberParseException:
+        phone_number = CachedPhoneNumber(raw_input=raw_number)
+        phone_number.valid = False
+    e164 = phone_number.as_e164 if phone_number.is_valid() else None
+    return phone_number, e164
+
+
+def get_default_region():
+    return getattr(settings, 'PHONENUMBER_DEFAULT_REGION', None)
+
+
+def parse_phonenumber(raw_number, region=None):
+    """Return a fresh PhoneNumber for the string, parsing each distinct input once."""
+    cached_number, e164 = parse_cached(raw_number, region or get_default_region())
+    phone_number = CachedPhoneNumber()
+    phone_number.merge_from(cached_number)
+    phone_number.valid = cached_number.valid
+    return phone_number
+
+
+def to_e164(raw_number, region=None):
+    """Return the number in E.164 format or None if it is not a valid number."""
+    return parse_cached(raw_number, region or get_default_region())[1]
+
+
+def preload_phone_metadata(region=ORDER_PHONE_REGION):
+    """Load region metadata and compile its patterns ahead of the first order."""
+    example = phonenumbers.example_number(region)
+    phonenumbers.is_valid_number(
+        phonenumbers.parse(phonenumbers.format_number(example, phonenumbers.PhoneNumberFormat.NATIONAL), region)
+    )
+
+
+class CachedPhoneNumberDescriptor(PhoneNumberDescriptor):
+    def __set__(self, instance, value):
+        if value and isinstance(value, str):
+            instance.__dict__[self.field.name] = parse_phonenumber(value, self.field.region)
+        else:
+            instance.__dict__[self.field.name] = to_python(value, region=self.field.region)
+
+
+class CachedPhoneNumberField(PhoneNumberField):
+    """PhoneNumberField that shares parsed numbers through the LRU cache."""
+
+    descriptor_class = CachedPhoneNumberDescriptor
+
+    def from_db_value(self, value, expression, connection):
+        if value and isinstance(value, str):
+            return parse_phonenumber(value)
+        return to_python(value)
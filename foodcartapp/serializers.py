@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from foodcartapp.models import Product, OrderItem, Order
-from phonenumbers import parse, is_valid_number, NumberParseException
+from foodcartapp.phones import ORDER_PHONE_REGION, to_e164
 
 
 class OrderItemSerializer(serializers.Serializer):
@@ -16,28 +16,26 @@ class OrderSerializer(serializers.Serializer):
     products = OrderItemSerializer(many=True, write_only=True, allow_empty=False)
 
     def validate_phonenumber(self, value):
-        try:
-            phonenumber = parse(value, "RU")
+        phonenumber = to_e164(value, ORDER_PHONE_REGION)
 
-            if not is_valid_number(phonenumber):
-                raise serializers.ValidationError("Введен некорректный номер телефона")
-
-        except NumberParseException:
+        if not phonenumber:
             raise serializers.ValidationError("Введен некорректный номер телефона")
 
-        return value
+        return phonenumber
 
     def validate_products(self, value):
         product_ids = [item['product'] for item in value]
-        existing_products = Product.objects.filter(id__in=product_ids)
-        existing_product_ids = set(existing_products.values_list('id', flat=True))
-        non_existing_products = set(product_ids) - existing_product_ids
+        existing_products = Product.objects.only('id', 'price').in_bulk(product_ids)
+        non_existing_products = set(product_ids) - set(existing_products)
 
         if non_existing_products:
             raise serializers.ValidationError(
                 f"Продукты с ID {list(non_existing_products)} не существуют"
             )
 
+        for item in value:
+            item['product'] = existing_products[item['product']]
+
         return value
 
     def create(self, validated_data):
@@ -47,16 +45,21 @@ class OrderSerializer(serializers.Serializer):
             firstname=validated_data.get('firstname', ''),
             lastname=validated_data['lastname'],
             phonenumber=validated_data['phonenumber'],
-            address=validated_data['address']
+            address=validated_data['address'],
+            total_price=sum(
+                item['product'].price * item['quantity']
+                for item in products_data
+            ),
         )
 
-        for item in products_data:
-            product = Product.objects.get(id=item['product'])
-            OrderItem.objects.create(
+        OrderItem.objects.bulk_create([
+            OrderItem(
                 order=order,
-                product=product,
+                product=item['product'],
                 quantity=item['quantity'],
-                price=product.price
+                price=item['product'].price
             )
+            for item in products_data
+        ])
 
         return order
@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from geocoordapp.jobs import enqueue_addresses
+from geocoordapp.models import Place
+
+from .availability import AVAILABILITY_VERSION
+from .caching import ORDERS_VERSION, bump_version_on_commit
+from .catalog import CATALOG_VERSION
+from .loads import change_load, track_order_load
+from .locator import LOCATIONS_VERSION, get_restaurant_locator
+from .models import DeletedOrder, Order, Product, ProductCategory, Restaurant, RestaurantMenuItem
+from .thumbnails import update_product_thumbnails
+
+# Long enough for any open dashboard to pick the deletion up from the feed
+DELETED_ORDERS_TTL = timedelta(days=1)
+
+
+@receiver(pre_save, sender=Product)
+def generate_product_thumbnails(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_product_thumbnails(instance)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductCategory)
+@receiver([post_save, post_delete], sender=RestaurantMenuItem)
+def invalidate_catalog(sender, **kwargs):
+    bump_version_on_commit(CATALOG_VERSION)
+
+
+@receiver([post_save, post_delete], sender=RestaurantMenuItem)
+def invalidate_availability(sender, **kwargs):
+    bump_version_on_commit(AVAILABILITY_VERSION)
+
+
+@receiver([post_save, post_delete], sender=Order)
+def notify_order_feed(sender, **kwargs):
+    bump_version_on_commit(ORDERS_VERSION)
+
+
+@receiver(post_delete, sender=Order)
+def remember_deleted_order(sender, instance, **kwargs):
+    DeletedOrder.objects.filter(deleted_at__lt=timezone.now() - DELETED_ORDERS_TTL).delete()
+    DeletedOrder.objects.create(order_id=instance.id)
+
+
+@receiver(post_save, sender=Order)
+def geocode_order_address(sender, instance, created, **kwargs):
+    if created:
+        enqueue_addresses([instance.address])
+
+
+@receiver(post_save, sender=Restaurant)
+def geocode_restaurant_address(sender, instance, **kwargs):
+    enqueue_addresses([instance.address])
+
+
+@receiver([post_save, post_delete], sender=Restaurant)
+def invalidate_restaurant_locations(sender, **kwargs):
+    bump_version_on_commit(LOCATIONS_VERSION)
+
+
+@receiver(post_save, sender=Place)
+def relocate_restaurant(sender, instance, **kwargs):
+    # Most places are order addresses, they must not rebuild the index
+    if get_restaurant_locator().is_outdated_by(instance):
+        bump_version_on_commit(LOCATIONS_VERSION)
+
+
+@receiver(post_delete, sender=Place)
+def forget_restaurant_place(sender, instance, **kwargs):
+    if instance.normalized_address in get_restaurant_locator().address_points:
+        bump_version_on_commit(LOCATIONS_VERSION)
+
+
+@receiver(pre_save, sender=Order)
+def remember_restaurant_load(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance.get_loaded_load_key()
+
+
+@receiver(post_save, sender=Order)
+def update_restaurant_load(sender, instance, **kwargs):
+    track_order_load(instance)
+
+
+@receiver(pre_delete, sender=Order)
+def release_restaurant_load(sender, instance, **kwargs):
+    restaurant_id = instance.get_loaded_load_key()
+    if restaurant_id:
+        change_load(restaurant_id, orders=-1, items=-instance.get_items_quantity())
@@ -0,0 +1,120 @@
+import hashlib
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+THUMBNAILS_DIR = 'thumbnails'
+# Stored in Product.image_hash so that a broken picture is not decoded on every save
+UNREADABLE_IMAGE = 'unreadable'
+THUMBNAIL_MAX_AGE = 365 * 24 * 60 * 60
+
+# Variants fit inside the box and keep the aspect ratio
+THUMBNAIL_SIZES = {
+    'small': (100, 100),
+    'medium': (400, 400),
+}
+
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def get_content_hash(content):
+    return hashlib.sha256(content).hexdigest()[:32]
+
+
+def get_thumbnail_path(image_hash, size, extension):
+    return f'{THUMBNAILS_DIR}/{image_hash[:2]}/{image_hash}-{size}.{extension}'
+
+
+def get_thumbnail_urls(image_hash):
+    """Return {size: {format: url}} for a processed image, or None."""
+    if not image_hash or image_hash == UNREADABLE_IMAGE:
+        return None
+    return {
+        size: {
+            extension: default_storage.url(get_thumbnail_path(image_hash, size, extension))
+            for extension in THUMBNAIL_FORMATS
+        }
+        for size in THUMBNAIL_SIZES
+    }
+
+
+def render_thumbnail(image, box, image_format, options):
+    thumbnail = image.copy()
+    thumbnail.thumbnail(box, Image.Resampling.LANCZOS)
+
+    if image_format == 'JPEG' and thumbnail.mode != 'RGB':
+        # JPEG has no alpha channel, put transparent pictures on white
+        background = Image.new('RGB', thumbnail.size, 'white')
+        rgba = thumbnail.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        thumbnail = background
+
+    output = io.BytesIO()
+    thumbnail.save(output, image_format, **options)
+    return output.getvalue()
+
+
+def generate_thumbnails(content):
+    """Write every variant of the image bytes once and return their content hash.
+
+    Variants of an already processed picture are left untouched, so uploading
+    the same photo for several products costs a single hash. Returns '' when
+    the bytes are not a readable image.
+    """
+    image_hash = get_content_hash(content)
+    paths = {
+        (size, extension): get_thumbnail_path(image_hash, size, extension)
+        for size in THUMBNAIL_SIZES
+        for extension in THUMBNAIL_FORMATS
+    }
+    missing = {key: path for key, path in paths.items() if not default_storage.exists(path)}
+    if not missing:
+        return image_hash
+
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        return ''
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+
+    for (size, extension), path in missing.items():
+        image_format, options = THUMBNAIL_FORMATS[extension]
+        default_storage.save(path, ContentFile(render_thumbnail(image, THUMBNAIL_SIZES[size], image_format, options)))
+    return image_hash
+
+
+def read_image(field_file):
+    """Return the bytes of a freshly uploaded or stored image, or None if it is missing."""
+    try:
+        field_file.open('rb')
+        field_file.seek(0)
+        content = field_file.read()
+        field_file.seek(0)
+    except (FileNotFoundError, ValueError):
+        return None
+    return content
+
+
+def update_product_thumbnails(product, force=False):
+    """Set `product.image_hash`, generating variants for a new upload.
+
+    Does nothing for products whose stored image was processed already or
+    turned out to be missing or unreadable.
+    """
+    if not product.image:
+        product.image_hash = ''
+        return
+    if product.image_hash and product.image._committed and not force:
+        return
+
+    content = read_image(product.image)
+    product.image_hash = (generate_thumbnails(content) if content else '') or UNREADABLE_IMAGE
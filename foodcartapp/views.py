@@ -1,16 +1,33 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.templatetags.static import static
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.static import serve
 
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from .models import Product
+from .catalog import get_catalog
+from .idempotency import (
+    claim_submission,
+    get_payload_hash,
+    get_submission_key,
+    is_same_payload,
+    store_response,
+)
 from .serializers import OrderSerializer
+from .thumbnails import THUMBNAIL_MAX_AGE
 
 from django.db import transaction
 
 
+def serve_thumbnail(request, path, document_root=None):
+    # File names carry the content hash, so a variant never changes under its URL
+    response = serve(request, path, document_root=document_root)
+    patch_cache_control(response, public=True, max_age=THUMBNAIL_MAX_AGE, immutable=True)
+    return response
+
+
 def banners_list_api(request):
     # FIXME move data to db?
     return JsonResponse([
@@ -36,44 +53,50 @@ def banners_list_api(request):
 
 
 def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    version, payload = get_catalog()
+    etag = f'"catalog-{version}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(payload, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
 
 
 @transaction.atomic
 @api_view(['POST'])
 def register_order(request):
     if request.method == 'POST':
+        key, ttl = get_submission_key(request)
+        submission = None
+        if key:
+            payload_hash = get_payload_hash(request.data)
+            submission, created = claim_submission(key, ttl, payload_hash)
+            if not created:
+                if not is_same_payload(submission, payload_hash):
+                    return Response(
+                        {'error': 'Ключ повтора уже использован для другого заказа'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                if submission.response is None:
+                    return Response(
+                        {'error': 'Заказ уже обрабатывается'},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+                return Response(submission.response, headers={'Idempotent-Replayed': 'true'})
+
         serializer = OrderSerializer(data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            order = serializer.save()
+            if submission:
+                store_response(submission, order, serializer.data)
 
             return Response(serializer.data)
 
+        if submission:
+            submission.delete()
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     return Response({'error': 'Метод не поддерживается'}, status=405)
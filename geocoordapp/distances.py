@@ -0,0 +1,64 @@
+import numpy as np
+from geopy.distance import geodesic
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Haversine differs from the ellipsoid distance by up to ~0.5%
+TIE_TOLERANCE = 0.005
+
+
+def haversine_matrix(origins, destinations):
+    """Return a len(origins) x len(destinations) matrix of distances in km."""
+    origins = np.radians(np.asarray(origins, dtype=float).reshape(-1, 2))
+    destinations = np.radians(np.asarray(destinations, dtype=float).reshape(-1, 2))
+
+    origin_lats = origins[:, 0, np.newaxis]
+    origin_lons = origins[:, 1, np.newaxis]
+    destination_lats = destinations[np.newaxis, :, 0]
+    destination_lons = destinations[np.newaxis, :, 1]
+
+    a = (
+        np.sin((destination_lats - origin_lats) / 2) ** 2
+        + np.cos(origin_lats) * np.cos(destination_lats)
+        * np.sin((destination_lons - origin_lons) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def refine_ties(distances, origins, destinations, columns=None, tolerance=TIE_TOLERANCE):
+    """Replace distances too close to their neighbours in a row with exact geodesic ones.
+
+    `columns` optionally lists, per row, the only destinations worth ranking.
+    """
+    for row, origin in enumerate(origins):
+        row_distances = distances[row]
+        if columns is None:
+            order = np.argsort(row_distances)
+        else:
+            row_columns = np.asarray(columns[row], dtype=int)
+            order = row_columns[np.argsort(row_distances[row_columns])]
+        sorted_distances = row_distances[order]
+
+        gaps = np.diff(sorted_distances)
+        close = gaps <= tolerance * sorted_distances[1:]
+        tied = np.zeros(len(order), dtype=bool)
+        tied[:-1] |= close
+        tied[1:] |= close
+
+        for column in order[tied]:
+            row_distances[column] = geodesic(origin, destinations[column]).km
+
+    return distances
+
+
+def distance_matrix(origins, destinations, exact_ties=False, columns=None):
+    origins = list(origins)
+    destinations = list(destinations)
+    if not origins or not destinations:
+        return np.zeros((len(origins), len(destinations)))
+
+    distances = haversine_matrix(origins, destinations)
+    if exact_ties:
+        refine_ties(distances, origins, destinations, columns=columns)
+    return distances
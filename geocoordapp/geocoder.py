@@ -0,0 +1,146 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from requests import RequestException
+from requests.adapters import HTTPAdapter
+
+from star_burger.metrics import GEOCODER_REQUEST_DURATION
+
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+FAILED = object()
+
+
+class GeocoderError(Exception):
+    """The geocoder could not answer, unlike an address it does not know."""
+
+
+class RateLimiter:
+    def __init__(self, requests_per_second):
+        self.interval = 1 / requests_per_second if requests_per_second else 0
+        self.lock = threading.Lock()
+        self.next_slot = 0
+
+    def wait(self):
+        if not self.interval:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class YandexGeocoder:
+    def __init__(self, apikey, base_url, timeout=5, max_workers=10,
+                 rate_limit=0, retries=2, backoff=0.5):
+        self.apikey = apikey
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.rate_limiter = RateLimiter(rate_limit)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, address):
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+
+            self.rate_limiter.wait()
+            started_at = time.perf_counter()
+            try:
+                response = self.session.get(self.base_url, params={
+                    "geocode": address,
+                    "apikey": self.apikey,
+                    "format": "json",
+                }, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                GEOCODER_REQUEST_DURATION.labels(outcome='error').observe(time.perf_counter() - started_at)
+                if attempt == self.retries:
+                    raise
+                continue
+            GEOCODER_REQUEST_DURATION.labels(outcome=response.status_code).observe(
+                time.perf_counter() - started_at,
+            )
+
+            if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                break
+
+        response.raise_for_status()
+        return response.json()
+
+    def fetch(self, address):
+        """Return (lat, lon) of the address or None when Yandex does not know it.
+
+        Raises GeocoderError on network and HTTP errors and malformed answers.
+        """
+        try:
+            found_places = self.request(address)['response']['GeoObjectCollection']['featureMember']
+
+            if not found_places:
+                return None
+
+            most_relevant = found_places[0]
+            lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
+            return float(lat), float(lon)
+
+        except (RequestException, KeyError, ValueError, TypeError) as error:
+            raise GeocoderError(f'Failed to geocode {address!r}: {error!r}') from error
+
+    def try_fetch(self, address):
+        try:
+            return address, self.fetch(address)
+        except GeocoderError as error:
+            logger.warning('%s', error)
+            return address, FAILED
+
+    def fetch_many(self, addresses):
+        """Geocode addresses concurrently, leaving out the ones that failed."""
+        addresses = list(dict.fromkeys(addresses))
+        if not addresses:
+            return {}
+
+        workers = min(self.max_workers, len(addresses))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return {
+                address: coordinates
+                for address, coordinates in executor.map(self.try_fetch, addresses)
+                if coordinates is not FAILED
+            }
+
+
+_geocoders = {}
+_geocoders_lock = threading.Lock()
+
+
+def get_geocoder(apikey=None):
+    apikey = apikey or settings.GEOAPP_TOKEN
+    with _geocoders_lock:
+        if apikey not in _geocoders:
+            _geocoders[apikey] = YandexGeocoder(
+                apikey,
+                base_url=settings.GEOCODER_URL,
+                timeout=settings.GEOCODER_TIMEOUT,
+                max_workers=settings.GEOCODER_MAX_WORKERS,
+                rate_limit=settings.GEOCODER_RATE_LIMIT,
+                retries=settings.GEOCODER_RETRIES,
+                backoff=settings.GEOCODER_BACKOFF,
+            )
+        return _geocoders[apikey]
@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import GeocodeJob, Place
+from .normalization import normalize_address
+
+
+def queue_jobs(addresses):
+    jobs = {}
+    for address in filter(None, addresses):
+        key = normalize_address(address)
+        jobs.setdefault(key, GeocodeJob(address=address, normalized_address=key))
+
+    GeocodeJob.objects.bulk_create(jobs.values(), ignore_conflicts=True)
+
+
+def enqueue_addresses(addresses):
+    """Queue addresses that are not cached yet or whose cached result expired."""
+    addresses = set(filter(None, addresses))
+    if not addresses:
+        return
+
+    queue_jobs(
+        address
+        for address, (status, place) in Place.objects.lookup(addresses).items()
+        if status != Place.FRESH
+    )
+
+
+def get_pending_addresses(addresses):
+    keys = {address: normalize_address(address) for address in addresses}
+    pending_keys = set(
+        GeocodeJob.objects
+        .filter(normalized_address__in=set(keys.values()))
+        .values_list('normalized_address', flat=True)
+    )
+    return {address for address, key in keys.items() if key in pending_keys}
+
+
+def claim_jobs(batch_size, lease):
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            GeocodeJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+            .order_by('created_at')[:batch_size]
+        )
+        GeocodeJob.objects.filter(
+            pk__in=[job.pk for job in jobs]
+        ).update(locked_until=now + lease)
+    return jobs
+
+
+def process_jobs(geocoder, batch_size=50, lease=timedelta(minutes=5)):
+    """Geocode a batch of queued addresses and return how many were processed."""
+    jobs = claim_jobs(batch_size, lease)
+    if not jobs:
+        return 0
+
+    fetched_coordinates = geocoder.fetch_many(job.address for job in jobs)
+    for address, coordinates in fetched_coordinates.items():
+        Place.objects.record_result(address, coordinates)
+
+    # Jobs the geocoder failed on stay locked and are retried when the lease expires
+    GeocodeJob.objects.filter(
+        pk__in=[job.pk for job in jobs if job.address in fetched_coordinates]
+    ).delete()
+    return len(jobs)
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from geocoordapp.geocoder import get_geocoder
+from geocoordapp.jobs import process_jobs
+from star_burger.metrics import start_metrics_server
+
+
+class Command(BaseCommand):
+    help = 'Геокодирует адреса из очереди и сохраняет координаты в места'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--sleep', type=float, default=2, help='пауза в секундах, когда очередь пуста')
+        parser.add_argument('--once', action='store_true', help='разобрать очередь и выйти')
+        parser.add_argument(
+            '--metrics-port',
+            type=int,
+            help='отдавать метрики Prometheus на этом порту, если у воркера нет общего с сайтом PROMETHEUS_MULTIPROC_DIR',
+        )
+        parser.add_argument(
+            '--metrics-addr',
+            default='127.0.0.1',
+            help='адрес для метрик, страница без токена, поэтому по умолчанию доступна только локально',
+        )
+
+    def handle(self, *args, **options):
+        if options['metrics_port']:
+            start_metrics_server(options['metrics_port'], options['metrics_addr'])
+
+        geocoder = get_geocoder()
+        while True:
+            processed = process_jobs(geocoder, batch_size=options['batch_size'])
+            if processed:
+                self.stdout.write(f'Обработано адресов: {processed}')
+                continue
+
+            if options['once']:
+                return
+            time.sleep(options['sleep'])
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from geocoordapp.models import Place
+from geocoordapp.normalization import normalize_address
+
+
+def place_priority(place):
+    return (place.is_located, -place.failures, place.updated_at)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает нормализованные адреса мест и объединяет дубликаты'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        places = list(Place.objects.all())
+
+        changed_places = []
+        places_by_key = {}
+        for place in places:
+            key = normalize_address(place.address)
+            if place.normalized_address != key:
+                place.normalized_address = key
+                changed_places.append(place)
+            places_by_key.setdefault(key, []).append(place)
+
+        Place.objects.bulk_update(changed_places, ['normalized_address'], batch_size=500)
+
+        duplicate_ids = []
+        for duplicates in places_by_key.values():
+            duplicates.sort(key=place_priority, reverse=True)
+            duplicate_ids.extend(place.id for place in duplicates[1:])
+
+        Place.objects.filter(id__in=duplicate_ids).delete()
+
+        self.stdout.write(
+            f'Обновлено адресов: {len(changed_places)}, '
+            f'удалено дубликатов: {len(duplicate_ids)}'
+        )
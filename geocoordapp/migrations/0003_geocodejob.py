@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:01
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geocoordapp', '0002_remove_place_request_place_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(max_length=256, unique=True, verbose_name='Адрес')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Поставлен в очередь')),
+                ('locked_until', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Обрабатывается до')),
+            ],
+            options={
+                'verbose_name': 'задача геокодирования',
+                'verbose_name_plural': 'задачи геокодирования',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_unresolved_places(apps, schema_editor):
+    Place = apps.get_model('geocoordapp', 'Place')
+    Place.objects.filter(models.Q(lat__isnull=True) | models.Q(lon__isnull=True)).update(failures=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geocoordapp', '0003_geocodejob'),
+    ]
+
+    operations = [
+        # A time of day can not be converted to a timestamp, so the column is recreated
+        migrations.RemoveField(
+            model_name='place',
+            name='updated_at',
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='updated_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Время обновления'),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='failures',
+            field=models.PositiveIntegerField(default=0, verbose_name='Неудачных запросов подряд'),
+        ),
+        migrations.RunPython(mark_unresolved_places, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations, models
+
+from geocoordapp.normalization import normalize_address
+
+
+def fill_normalized_addresses(apps, schema_editor):
+    Place = apps.get_model('geocoordapp', 'Place')
+    places = list(Place.objects.only('id', 'address'))
+    for place in places:
+        place.normalized_address = normalize_address(place.address)
+    Place.objects.bulk_update(places, ['normalized_address'], batch_size=500)
+
+
+def clear_geocode_jobs(apps, schema_editor):
+    # Queued jobs are transient, the dashboard queues unresolved addresses again
+    GeocodeJob = apps.get_model('geocoordapp', 'GeocodeJob')
+    GeocodeJob.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geocoordapp', '0004_place_updated_at_datetime_place_failures'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='normalized_address',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=256, verbose_name='Нормализованный адрес'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_normalized_addresses, migrations.RunPython.noop),
+        migrations.RunPython(clear_geocode_jobs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='geocodejob',
+            name='address',
+            field=models.CharField(max_length=256, verbose_name='Адрес'),
+        ),
+        migrations.AddField(
+            model_name='geocodejob',
+            name='normalized_address',
+            field=models.CharField(default='', max_length=256, unique=True, verbose_name='Нормализованный адрес'),
+            preserve_default=False,
+        ),
+    ]
@@ -1,7 +1,47 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+from .normalization import normalize_address
+
+
+class PlaceQuerySet(models.QuerySet):
+    def lookup(self, addresses):
+        """Map every address to a (status, place) pair, place is None when missing."""
+        keys = {address: normalize_address(address) for address in addresses}
+
+        places = {}
+        for place in self.filter(normalized_address__in=set(keys.values())):
+            places[place.normalized_address] = place
+
+        lookup = {}
+        for address, key in keys.items():
+            place = places.get(key)
+            lookup[address] = (place.cache_status, place) if place else (Place.MISSING, None)
+        return lookup
+
+    def record_result(self, address, coordinates):
+        now = timezone.now()
+        place = self.filter(normalized_address=normalize_address(address)).first()
+        if not place:
+            place = Place(address=address)
+
+        if coordinates:
+            place.lat, place.lon = coordinates
+            place.failures = 0
+        else:
+            place.failures += 1
+        place.updated_at = now
+        place.save()
 
 
 class Place(models.Model):
+    FRESH = 'fresh'
+    STALE = 'stale'
+    MISSING = 'missing'
+
     lon = models.FloatField(
         verbose_name='Долгота',
         blank=True,
@@ -17,11 +57,88 @@ class Place(models.Model):
         verbose_name='Адрес',
         unique=True,
     )
-    updated_at = models.TimeField(
-        auto_now=True,
+    normalized_address = models.CharField(
+        max_length=256,
+        verbose_name='Нормализованный адрес',
+        db_index=True,
+        editable=False,
+    )
+    updated_at = models.DateTimeField(
+        default=timezone.now,
         verbose_name='Время обновления',
+        db_index=True,
+    )
+    failures = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Неудачных запросов подряд',
     )
 
+    objects = PlaceQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'место'
         verbose_name_plural = 'места'
+
+    def __str__(self):
+        return self.address
+
+    def save(self, *args, **kwargs):
+        self.normalized_address = normalize_address(self.address)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'address' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'normalized_address'}
+        super().save(*args, **kwargs)
+
+    @property
+    def is_located(self):
+        return self.lat is not None and self.lon is not None
+
+    @property
+    def coordinates(self):
+        return self.lat, self.lon
+
+    @property
+    def expires_at(self):
+        if not self.failures:
+            return self.updated_at + timedelta(seconds=settings.GEOCODE_TTL)
+
+        # Back off exponentially on addresses that keep failing
+        negative_ttl = min(
+            settings.GEOCODE_NEGATIVE_TTL * 2 ** (self.failures - 1),
+            settings.GEOCODE_NEGATIVE_TTL_MAX,
+        )
+        return self.updated_at + timedelta(seconds=negative_ttl)
+
+    @property
+    def cache_status(self):
+        return self.FRESH if timezone.now() < self.expires_at else self.STALE
+
+
+class GeocodeJob(models.Model):
+    address = models.CharField(
+        max_length=256,
+        verbose_name='Адрес',
+    )
+    normalized_address = models.CharField(
+        max_length=256,
+        verbose_name='Нормализованный адрес',
+        unique=True,
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Поставлен в очередь',
+        db_index=True,
+    )
+    locked_until = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Обрабатывается до',
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'задача геокодирования'
+        verbose_name_plural = 'задачи геокодирования'
+
+    def __str__(self):
+        return self.address
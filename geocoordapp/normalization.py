@@ -0,0 +1,50 @@
+import re
+
+
+ABBREVIATIONS = {
+    'г': 'город',
+    'гор': 'город',
+    'обл': 'область',
+    'р-н': 'район',
+    'мкр': 'микрорайон',
+    'мкрн': 'микрорайон',
+    'ул': 'улица',
+    'пр': 'проспект',
+    'пр-т': 'проспект',
+    'пр-кт': 'проспект',
+    'просп': 'проспект',
+    'пер': 'переулок',
+    'пл': 'площадь',
+    'ш': 'шоссе',
+    'наб': 'набережная',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'бульв': 'бульвар',
+    'пр-д': 'проезд',
+    'туп': 'тупик',
+    'корп': 'корпус',
+    'к': 'корпус',
+    'стр': 'строение',
+    'кв': 'квартира',
+    'эт': 'этаж',
+    'под': 'подъезд',
+}
+
+# "дом" carries no information: "Ленина, д. 5" and "Ленина 5" are the same place
+DROPPED_WORDS = {'д', 'дом'}
+
+TOKEN_PATTERN = re.compile(r'[\w/-]+')
+
+
+def normalize_address(address):
+    """Build a canonical key that is equal for spellings of the same address."""
+    tokens = TOKEN_PATTERN.findall(address.casefold().replace('ё', 'е'))
+
+    words = []
+    for token in tokens:
+        token = token.strip('-')
+        word = ABBREVIATIONS.get(token, token)
+        if word and word not in DROPPED_WORDS:
+            words.append(word)
+
+    return ' '.join(words)
@@ -0,0 +1,59 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubGeocoderHandler(BaseHTTPRequestHandler):
+    """Answer like Yandex geocoder: known addresses map to `lon lat` points."""
+
+    def do_GET(self):
+        server = self.server
+        address = parse_qs(urlparse(self.path).query)['geocode'][0]
+
+        with server.lock:
+            server.requests.append(address)
+            failures_left = server.failures.get(address, 0)
+            server.failures[address] = max(failures_left - 1, 0)
+            server.in_flight += 1
+            server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+        if failures_left:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        feature_members = []
+        if address in server.places:
+            lat, lon = server.places[address]
+            feature_members.append({'GeoObject': {'Point': {'pos': f'{lon} {lat}'}}})
+
+        body = json.dumps({
+            'response': {'GeoObjectCollection': {'featureMember': feature_members}},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_geocoder(places, delay=0, failures=None):
+    """Serve `places` ({address: (lat, lon)}) on a free local port until shutdown()."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubGeocoderHandler)
+    server.places = places
+    server.delay = delay
+    server.failures = dict(failures or {})
+    server.requests = []
+    server.in_flight = 0
+    server.peak_in_flight = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
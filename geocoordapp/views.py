@@ -1,24 +1,8 @@
-import requests
-from requests import RequestException
+from .geocoder import GeocoderError, get_geocoder
 
 
 def fetch_coordinates(apikey, address):
-    base_url = "https://geocode-maps.yandex.ru/1.x"
     try:
-        response = requests.get(base_url, params={
-            "geocode": address,
-            "apikey": apikey,
-            "format": "json",
-        })
-        response.raise_for_status()
-        found_places = response.json()['response']['GeoObjectCollection']['featureMember']
-
-        if not found_places:
-            return None
-
-        most_relevant = found_places[0]
-        lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
-        return float(lat), float(lon)
-
-    except (RequestException, KeyError, ValueError, TypeError):
+        return get_geocoder(apikey).fetch(address)
+    except GeocoderError:
         return None
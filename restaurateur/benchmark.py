@@ -0,0 +1,245 @@
+import random
+import time
+import uuid
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from foodcartapp.availability import AVAILABILITY_VERSION
+from foodcartapp.caching import bump_version
+from foodcartapp.catalog import CATALOG_VERSION
+from foodcartapp.loads import recount_restaurant_loads
+from foodcartapp.locator import LOCATIONS_VERSION
+from foodcartapp.models import (
+    Order,
+    OrderItem,
+    Product,
+    ProductCategory,
+    Restaurant,
+    RestaurantMenuItem,
+)
+from geocoordapp.geocoder import YandexGeocoder
+from geocoordapp.jobs import process_jobs, queue_jobs
+from geocoordapp.stub import start_stub_geocoder
+
+from .dashboard import build_order_section
+
+
+MOSCOW_BOUNDS = ((55.5, 56.0), (37.3, 37.9))
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def random_point(generator):
+    (min_lat, max_lat), (min_lon, max_lon) = MOSCOW_BOUNDS
+    return generator.uniform(min_lat, max_lat), generator.uniform(min_lon, max_lon)
+
+
+def seed_data(generator, restaurants_count, products_count, orders_count, customers_count, coverage):
+    """Fill the database with a catalogue, menus, customers and order history.
+
+    Returns the created products and the customers as (phonenumber, address) pairs.
+    """
+    categories = ProductCategory.objects.bulk_create([
+        ProductCategory(name=name) for name in ['Бургеры', 'Напитки', 'Десерты']
+    ])
+    products = Product.objects.bulk_create([
+        Product(
+            name=f'Блюдо {number}',
+            category=generator.choice(categories),
+            price=generator.randint(100, 600),
+            image='burger.jpg',
+        )
+        for number in range(products_count)
+    ])
+    restaurants = Restaurant.objects.bulk_create([
+        Restaurant(name=f'Ресторан {number}', address=f'Москва, ресторан {number}')
+        for number in range(restaurants_count)
+    ])
+    RestaurantMenuItem.objects.bulk_create([
+        RestaurantMenuItem(restaurant=restaurant, product=product)
+        for restaurant in restaurants
+        for product in products
+        if generator.random() < coverage
+    ])
+
+    customers = [
+        (f'+7912{number:07d}', f'Москва, клиент {number}')
+        for number in range(customers_count)
+    ]
+    statuses = [status for status, name in Order.ORDER_STATUS]
+    orders = []
+    for number in range(orders_count):
+        phonenumber, address = generator.choice(customers)
+        status = generator.choices(statuses, weights=[2, 1, 1, 6])[0]
+        orders.append(Order(
+            firstname='Иван',
+            lastname=f'Клиент {number}',
+            phonenumber=phonenumber,
+            address=address,
+            status=status,
+            payment_method=generator.choice(Order.PAYMENT_METHOD)[0],
+            restaurant=generator.choice(restaurants) if status != 'accepted' else None,
+        ))
+    orders = Order.objects.bulk_create(orders)
+
+    items = []
+    for order in orders:
+        for product in generator.sample(products, generator.randint(1, 4)):
+            items.append(OrderItem(
+                order=order,
+                product=product,
+                quantity=generator.randint(1, 3),
+                price=product.price,
+            ))
+            order.total_price += product.price * items[-1].quantity
+    OrderItem.objects.bulk_create(items, batch_size=1000)
+    Order.objects.bulk_update(orders, ['total_price'], batch_size=1000)
+
+    recount_restaurant_loads()
+    for version in [CATALOG_VERSION, AVAILABILITY_VERSION, LOCATIONS_VERSION]:
+        bump_version(version)
+
+    return products, customers
+
+
+def geocode_addresses(geocoder, addresses):
+    queue_jobs(addresses)
+    while process_jobs(geocoder, batch_size=200):
+        pass
+
+
+def get_percentile(values, percentile):
+    return round(float(np.percentile(values, percentile)) * 1000, 2)
+
+
+def measure(client, make_request, count, warmup):
+    """Send `count` requests after `warmup` unmeasured ones and summarise them."""
+    durations = []
+    query_counts = []
+    query_durations = []
+    response_sizes = []
+    for number in range(warmup + count):
+        method, url, kwargs = make_request(number)
+        with CaptureQueriesContext(connection) as queries:
+            started_at = time.perf_counter()
+            response = getattr(client, method.lower())(url, **kwargs)
+            duration = time.perf_counter() - started_at
+
+        if response.status_code != 200:
+            raise BenchmarkError(f'{method} {url}: {response.status_code} {response.content[:200]!r}')
+        if number < warmup:
+            continue
+
+        durations.append(duration)
+        query_counts.append(len(queries))
+        query_durations.append(sum(float(query['time']) for query in queries))
+        response_sizes.append(len(response.content))
+
+    return {
+        'requests': count,
+        'p50_ms': get_percentile(durations, 50),
+        'p95_ms': get_percentile(durations, 95),
+        'mean_ms': round(float(np.mean(durations)) * 1000, 2),
+        'max_ms': round(max(durations) * 1000, 2),
+        'throughput_rps': round(count / sum(durations), 1),
+        'queries_mean': round(float(np.mean(query_counts)), 2),
+        'queries_max': max(query_counts),
+        'db_ms_mean': round(float(np.mean(query_durations)) * 1000, 2),
+        'response_bytes_mean': round(float(np.mean(response_sizes))),
+    }
+
+
+def measure_section_scaling(repeats):
+    """Time the accepted orders section built for a tenth and for all of its orders.
+
+    Linear work keeps the time per row of both sizes close.
+    """
+    total = Order.objects.filter(status='accepted').count()
+    results = []
+    for limit in [max(total // 10, 1), total]:
+        durations = []
+        for number in range(repeats):
+            with CaptureQueriesContext(connection) as queries:
+                started_at = time.perf_counter()
+                section = build_order_section('accepted', limit=limit)
+                durations.append(time.perf_counter() - started_at)
+
+        rows = len(section.rows)
+        results.append({
+            'rows': rows,
+            'p50_ms': get_percentile(durations, 50),
+            'ms_per_row': round(float(np.median(durations)) * 1000 / max(rows, 1), 3),
+            'queries': len(queries),
+        })
+    return results
+
+
+def run_benchmark(restaurants_count=50, products_count=100, orders_count=2000, customers_count=500,
+                  coverage=0.7, requests_count=200, warmup=5, seed=0):
+    """Seed the current database and time the order API and the manager pages.
+
+    Addresses are geocoded by a local stub server, so no network access is needed.
+    """
+    generator = random.Random(seed)
+
+    places = {f'Москва, ресторан {number}': random_point(generator) for number in range(restaurants_count)}
+    places.update({f'Москва, клиент {number}': random_point(generator) for number in range(customers_count)})
+    server = start_stub_geocoder(places)
+    try:
+        geocoder = YandexGeocoder('benchmark', base_url=f'http://127.0.0.1:{server.server_port}/1.x')
+
+        started_at = time.perf_counter()
+        products, customers = seed_data(
+            generator, restaurants_count, products_count, orders_count, customers_count, coverage,
+        )
+        geocode_addresses(geocoder, places)
+        seed_duration = time.perf_counter() - started_at
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    def post_order(number):
+        phonenumber, address = generator.choice(customers)
+        return 'POST', '/api/order/', {
+            'data': {
+                'firstname': 'Иван',
+                'lastname': f'Клиент {number}',
+                'phonenumber': phonenumber,
+                'address': address,
+                'products': [
+                    {'product': product.id, 'quantity': generator.randint(1, 3)}
+                    for product in generator.sample(products, generator.randint(1, 4))
+                ],
+            },
+            'content_type': 'application/json',
+            'headers': {'Idempotency-Key': str(uuid.uuid4())},
+        }
+
+    scenarios = {
+        'api_products': lambda number: ('GET', '/api/products/', {}),
+        'api_order': post_order,
+        'manager_orders': lambda number: ('GET', reverse('restaurateur:view_orders'), {}),
+        'manager_orders_accepted': lambda number: (
+            'GET', reverse('restaurateur:order_section', args=['accepted']), {},
+        ),
+    }
+
+    client = Client()
+    manager = User.objects.create_user('benchmark', is_staff=True)
+    client.force_login(manager)
+
+    return {
+        'seed_seconds': round(seed_duration, 2),
+        'scenarios': {
+            name: measure(client, make_request, requests_count, warmup)
+            for name, make_request in scenarios.items()
+        },
+        'order_section_scaling': measure_section_scaling(max(warmup, 3)),
+    }
@@ -0,0 +1,295 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from foodcartapp.availability import attach_available_restaurants
+from foodcartapp.loads import get_restaurant_loads
+from foodcartapp.locator import get_restaurant_locator
+from foodcartapp.models import DeletedOrder, Order, OrderItem, Restaurant
+from geocoordapp.distances import distance_matrix
+from geocoordapp.jobs import get_pending_addresses, queue_jobs
+from geocoordapp.models import Place
+
+
+SECTION_STATUSES = ['accepted', 'in_progress', 'in_delivery']
+
+ORDER_ROW_FIELDS = [
+    'id', 'status', 'payment_method', 'total_price', 'firstname', 'lastname',
+    'phonenumber', 'address', 'comment', 'restaurant_id', 'registered_at',
+]
+
+FEED_OVERLAP = timedelta(seconds=5)
+
+ADDRESS_PENDING = 'адрес ресторана определяется'
+ADDRESS_NOT_FOUND = 'адрес ресторана не найден'
+
+
+@dataclass
+class RestaurantCandidate:
+    name: str
+    distance: float = None
+    note: str = ''
+    orders_in_progress: int = 0
+
+
+@dataclass
+class OrderRow:
+    id: int
+    status: str
+    payment_method: str
+    total_price: object
+    client: str
+    phonenumber: str
+    address: str
+    comment: str
+    restaurant: str = ''
+    address_pending: bool = False
+    address_not_found: bool = False
+    candidates: list = field(default_factory=list)
+
+    @classmethod
+    def from_order(cls, order, restaurants):
+        restaurant = restaurants.get(order.restaurant_id)
+        return cls(
+            id=order.id,
+            status=order.get_status_display(),
+            payment_method=order.get_payment_method_display(),
+            total_price=order.total_price,
+            client=f'{order.firstname} {order.lastname}',
+            phonenumber=str(order.phonenumber),
+            address=order.address,
+            comment=order.comment,
+            restaurant=restaurant.name if restaurant else '',
+        )
+
+
+@dataclass
+class OrderSection:
+    rows: list
+    next_cursor: str = None
+
+
+@dataclass
+class OrderUpdate:
+    id: int
+    status: str
+    row: OrderRow = None
+
+
+def rank_candidates(orders, restaurants):
+    """Attach the nearest restaurants able to cook each order to its row."""
+    order_addresses = {order.address for order in orders}
+    restaurant_addresses = {
+        restaurants[restaurant_id].address
+        for order in orders
+        for restaurant_id in order.available_restaurant_ids
+        if restaurant_id in restaurants
+    }
+    all_addresses = order_addresses | restaurant_addresses
+
+    places_lookup = Place.objects.lookup(all_addresses)
+    queue_jobs(
+        address for address, (status, place) in places_lookup.items()
+        if status != Place.FRESH
+    )
+    pending_addresses = get_pending_addresses(all_addresses)
+    located_places = {
+        address: place for address, (status, place) in places_lookup.items()
+        if place and place.is_located
+    }
+
+    locator = get_restaurant_locator()
+    nearest_restaurant_ids = {}
+    for order in orders:
+        if order.address in located_places:
+            nearest_restaurant_ids[order.id] = [
+                restaurant_id for restaurant_id, km in locator.nearest(
+                    located_places[order.address].coordinates,
+                    k=settings.MANAGER_NEAREST_RESTAURANTS,
+                    among=order.available_restaurant_ids,
+                )
+            ]
+
+    located_order_addresses = list({
+        order.address for order in orders if order.id in nearest_restaurant_ids
+    })
+    located_restaurant_addresses = list({
+        restaurants[restaurant_id].address
+        for restaurant_ids in nearest_restaurant_ids.values()
+        for restaurant_id in restaurant_ids
+        if restaurant_id in restaurants
+        and restaurants[restaurant_id].address in located_places
+    })
+    order_rows = {address: row for row, address in enumerate(located_order_addresses)}
+    restaurant_columns = {
+        address: column for column, address in enumerate(located_restaurant_addresses)
+    }
+
+    candidate_columns = [set() for address in located_order_addresses]
+    for order in orders:
+        for restaurant_id in nearest_restaurant_ids.get(order.id, []):
+            restaurant = restaurants.get(restaurant_id)
+            if restaurant and restaurant.address in restaurant_columns:
+                candidate_columns[order_rows[order.address]].add(
+                    restaurant_columns[restaurant.address]
+                )
+
+    distances = distance_matrix(
+        [located_places[address].coordinates for address in located_order_addresses],
+        [located_places[address].coordinates for address in located_restaurant_addresses],
+        exact_ties=True,
+        columns=[sorted(columns) for columns in candidate_columns],
+    )
+
+    loads = get_restaurant_loads({
+        restaurant_id for restaurant_ids in nearest_restaurant_ids.values()
+        for restaurant_id in restaurant_ids
+    })
+
+    rows = []
+    for order in orders:
+        row = OrderRow.from_order(order, restaurants)
+        rows.append(row)
+
+        if order.id not in nearest_restaurant_ids:
+            if order.address in pending_addresses:
+                row.address_pending = True
+            else:
+                row.address_not_found = True
+            continue
+
+        candidate_ids = nearest_restaurant_ids[order.id] + [
+            restaurant_id for restaurant_id in order.available_restaurant_ids
+            if restaurant_id not in locator
+        ]
+        for restaurant_id in candidate_ids:
+            restaurant = restaurants.get(restaurant_id)
+            if not restaurant:
+                continue
+
+            if restaurant.address in restaurant_columns:
+                load = loads.get(restaurant_id)
+                row.candidates.append(RestaurantCandidate(
+                    name=restaurant.name,
+                    distance=round(float(distances[
+                        order_rows[order.address],
+                        restaurant_columns[restaurant.address],
+                    ]), 2),
+                    orders_in_progress=load.orders_in_progress if load else 0,
+                ))
+            elif restaurant.address in pending_addresses:
+                row.candidates.append(RestaurantCandidate(restaurant.name, note=ADDRESS_PENDING))
+            else:
+                row.candidates.append(RestaurantCandidate(restaurant.name, note=ADDRESS_NOT_FOUND))
+
+        # A busy restaurant nearby may cook later than an idle one a bit farther
+        row.candidates.sort(key=lambda candidate: (
+            candidate.distance is None,
+            (candidate.distance or 0)
+            + settings.RESTAURANT_LOAD_PENALTY_KM * candidate.orders_in_progress,
+            candidate.note,
+        ))
+
+    return rows
+
+
+def encode_cursor(order):
+    return f'{order.registered_at.isoformat()}_{order.id}'
+
+
+def decode_cursor(cursor):
+    registered_at, order_id = cursor.rsplit('_', 1)
+    return datetime.fromisoformat(registered_at), int(order_id)
+
+
+def get_section_orders(status):
+    orders = Order.objects.filter(status=status).only(*ORDER_ROW_FIELDS)
+    if status == 'accepted':
+        orders = orders.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.only('order_id', 'product_id'))
+        )
+    return orders
+
+
+def build_rows(status, orders):
+    if status == 'accepted':
+        attach_available_restaurants(orders)
+
+    restaurant_ids = {order.restaurant_id for order in orders}
+    for order in orders:
+        restaurant_ids.update(getattr(order, 'available_restaurant_ids', []))
+    restaurants = Restaurant.objects.in_bulk(restaurant_ids - {None})
+
+    if status == 'accepted':
+        return rank_candidates(orders, restaurants)
+    return [OrderRow.from_order(order, restaurants) for order in orders]
+
+
+def build_order_section(status, filters=None, cursor=None, limit=None):
+    """Return one page of a dashboard section, ordered by (registered_at, id)."""
+    filters = filters or {}
+    orders = get_section_orders(status)
+
+    if filters.get('restaurant'):
+        orders = orders.filter(restaurant=filters['restaurant'])
+    if filters.get('payment_method'):
+        orders = orders.filter(payment_method=filters['payment_method'])
+    if filters.get('older_than'):
+        orders = orders.filter(
+            registered_at__lte=timezone.now() - timedelta(minutes=filters['older_than'])
+        )
+    if cursor:
+        registered_at, order_id = decode_cursor(cursor)
+        orders = orders.filter(
+            Q(registered_at__gt=registered_at)
+            | Q(registered_at=registered_at, id__gt=order_id)
+        )
+
+    orders = orders.order_by('registered_at', 'id')
+    if limit:
+        orders = list(orders[:limit + 1])
+        next_cursor = encode_cursor(orders[limit - 1]) if len(orders) > limit else None
+        orders = orders[:limit]
+    else:
+        orders = list(orders)
+        next_cursor = None
+
+    return OrderSection(rows=build_rows(status, orders), next_cursor=next_cursor)
+
+
+def build_order_updates(since):
+    """Return a new cursor and the orders changed after `since`.
+
+    Orders saved shortly before `since` are re-sent as well: a transaction that
+    committed late may carry an older updated_at than rows already delivered.
+    Deleted orders come with no status and no row.
+    """
+    changes = list(
+        Order.objects
+        .filter(updated_at__gt=since - FEED_OVERLAP)
+        .values_list('id', 'status', 'updated_at')
+    )
+    changes += [
+        (order_id, None, deleted_at)
+        for order_id, deleted_at in DeletedOrder.objects
+        .filter(deleted_at__gt=since - FEED_OVERLAP)
+        .values_list('order_id', 'deleted_at')
+    ]
+    if not any(updated_at > since for order_id, status, updated_at in changes):
+        return since, []
+
+    updates = []
+    for status in {status for order_id, status, updated_at in changes}:
+        order_ids = [order_id for order_id, order_status, updated_at in changes if order_status == status]
+        if status not in SECTION_STATUSES:
+            updates += [OrderUpdate(order_id, status) for order_id in order_ids]
+            continue
+
+        orders = list(get_section_orders(status).filter(id__in=order_ids).order_by('registered_at', 'id'))
+        updates += [OrderUpdate(row.id, status, row) for row in build_rows(status, orders)]
+
+    cursor = max(updated_at for order_id, status, updated_at in changes)
+    return cursor, updates
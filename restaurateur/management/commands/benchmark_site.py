@@ -0,0 +1,94 @@
+import json
+import subprocess
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from restaurateur.benchmark import BenchmarkError, run_benchmark
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет скорость API заказов и страниц менеджера на синтетических данных '
+        'во временной тестовой базе и сохраняет результаты в JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=50)
+        parser.add_argument('--products', type=int, default=100)
+        parser.add_argument('--orders', type=int, default=2000, help='заказов в истории')
+        parser.add_argument('--customers', type=int, default=500, help='постоянных клиентов с разными адресами')
+        parser.add_argument('--coverage', type=float, default=0.7, help='доля меню, доступная в ресторане')
+        parser.add_argument('--requests', type=int, default=200, help='запросов на каждый адрес')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='benchmark.json')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_database_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # A private cache keeps version bumps away from the running site
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'benchmark',
+            }}):
+                results = run_benchmark(
+                    restaurants_count=options['restaurants'],
+                    products_count=options['products'],
+                    orders_count=options['orders'],
+                    customers_count=options['customers'],
+                    coverage=options['coverage'],
+                    requests_count=options['requests'],
+                    warmup=options['warmup'],
+                    seed=options['seed'],
+                )
+        except BenchmarkError as error:
+            raise CommandError(error)
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'commit': get_commit(),
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'options': {
+                name: options[name] for name in [
+                    'restaurants', 'products', 'orders', 'customers',
+                    'coverage', 'requests', 'warmup', 'seed',
+                ]
+            },
+            **results,
+        }
+        Path(options['output']).write_text(json.dumps(report, ensure_ascii=False, indent=2))
+
+        for name, result in results['scenarios'].items():
+            self.stdout.write(
+                f'{name}: p50 {result["p50_ms"]} мс, p95 {result["p95_ms"]} мс, '
+                f'{result["queries_mean"]} запросов к БД, {result["throughput_rps"]} запросов/с'
+            )
+        for result in results['order_section_scaling']:
+            self.stdout.write(
+                f'раздел новых заказов, {result["rows"]} строк: p50 {result["p50_ms"]} мс, '
+                f'{result["ms_per_row"]} мс на строку, {result["queries"]} запросов к БД'
+            )
+        self.stdout.write(f'Результаты сохранены в {options["output"]}')
@@ -1,3 +1,1558 @@
-from django.test import TestCase
+import io
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from geopy.distance import geodesic
+from PIL import Image
+
+from foodcartapp.admin import ApproximateCountPaginator
+from foodcartapp.assignment import assign_orders, plan_assignments
+from foodcartapp.availability import AVAILABILITY_VERSION, get_availability_matrix
+from foodcartapp.caching import bump_version, get_version
+from foodcartapp.catalog import CATALOG_VERSION
+from foodcartapp.loads import recount_restaurant_loads
+from foodcartapp.locator import LOCATIONS_VERSION, RestaurantLocator, get_restaurant_locator
+from foodcartapp.phones import parse_cached, to_e164
+from foodcartapp.models import (
+    Order,
+    OrderItem,
+    OrderSubmission,
+    Product,
+    Restaurant,
+    RestaurantLoad,
+    RestaurantMenuItem,
+)
+from foodcartapp.thumbnails import UNREADABLE_IMAGE, get_thumbnail_path
+from foodcartapp.views import serve_thumbnail
+from geocoordapp.distances import distance_matrix
+from geocoordapp.geocoder import GeocoderError, YandexGeocoder
+from geocoordapp.jobs import process_jobs, queue_jobs
+from geocoordapp.models import GeocodeJob, Place
+from geocoordapp.normalization import normalize_address
+from geocoordapp.stub import start_stub_geocoder
+from restaurateur.benchmark import run_benchmark
+from restaurateur.dashboard import build_order_section
+from star_burger.metrics import QueryTimer, reset_metrics, start_metrics_server
+from star_burger.queries import QueryInspectionMiddleware, fingerprint, query_budget
+
+
+def create_products(count):
+    return Product.objects.bulk_create([
+        Product(name=f'Бургер {number}', price=100 + number, image='burger.jpg')
+        for number in range(count)
+    ])
+
+
+class RegisterOrderTest(TestCase):
+    def post_order(self, products):
+        payload = {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79123456789',
+            'address': 'Москва, Красная площадь, 1',
+            'products': [
+                {'product': product.id, 'quantity': 2}
+                for product in products
+            ],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/order/', payload, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        products = create_products(15)
+
+        small_cart_queries = self.post_order(products[:1])
+        large_cart_queries = self.post_order(products)
+
+        self.assertEqual(small_cart_queries, large_cart_queries)
+
+    def test_items_keep_product_price(self):
+        products = create_products(3)
+
+        self.post_order(products)
+
+        order = Order.objects.get()
+        self.assertEqual(
+            sorted(order.items.values_list('product_id', 'quantity', 'price')),
+            sorted((product.id, 2, product.price) for product in products),
+        )
+        self.assertEqual(order.total_price, sum(product.price * 2 for product in products))
+
+
+class OrderIdempotencyTest(TestCase):
+    def setUp(self):
+        self.products = create_products(2)
+        self.payload = {
+            'lastname': 'Петров',
+            'phonenumber': '+79123456789',
+            'address': 'Москва, Красная площадь, 1',
+            'products': [{'product': product.id, 'quantity': 1} for product in self.products],
+        }
+
+    def post_order(self, **headers):
+        return self.client.post(
+            '/api/order/',
+            self.payload,
+            content_type='application/json',
+            headers=headers,
+        )
+
+    def test_retry_with_key_replays_response(self):
+        first_response = self.post_order(**{'Idempotency-Key': 'checkout-1'})
+        Product.objects.filter(id=self.products[0].id).delete()
+
+        with CaptureQueriesContext(connection) as queries:
+            retry_response = self.post_order(**{'Idempotency-Key': 'checkout-1'})
+
+        self.assertEqual(retry_response.status_code, 200, retry_response.content)
+        self.assertEqual(retry_response.json(), first_response.json())
+        self.assertEqual(retry_response['Idempotent-Replayed'], 'true')
+        self.assertFalse(any('foodcartapp_product' in query['sql'] for query in queries))
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_reused_with_other_cart_is_rejected(self):
+        self.post_order(**{'Idempotency-Key': 'checkout-1'})
+
+        self.payload['products'].reverse()
+        self.assertEqual(self.post_order(**{'Idempotency-Key': 'checkout-1'}).status_code, 200)
+
+        self.payload['products'][0]['quantity'] = 5
+        response = self.post_order(**{'Idempotency-Key': 'checkout-1'})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_different_keys_create_orders(self):
+        self.post_order(**{'Idempotency-Key': 'checkout-1'})
+        self.post_order(**{'Idempotency-Key': 'checkout-2'})
+
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_same_cart_without_key_is_deduplicated(self):
+        self.post_order()
+        self.post_order()
+        self.assertEqual(Order.objects.count(), 1)
+
+        self.payload['products'][0]['quantity'] = 2
+        self.post_order()
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_corrected_order_without_key_is_created(self):
+        self.post_order()
+
+        self.payload['address'] = 'Москва, Красная площадь, 2'
+        response = self.post_order()
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            list(Order.objects.order_by('id').values_list('address', flat=True)),
+            ['Москва, Красная площадь, 1', 'Москва, Красная площадь, 2'],
+        )
+
+    @override_settings(ORDER_DUPLICATE_WINDOW=0)
+    def test_window_can_be_disabled(self):
+        self.post_order()
+        self.post_order()
+
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_expired_key_is_reused(self):
+        self.post_order(**{'Idempotency-Key': 'checkout-1'})
+        OrderSubmission.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.post_order(**{'Idempotency-Key': 'checkout-1'})
+
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(OrderSubmission.objects.count(), 1)
+
+    def test_invalid_order_frees_key(self):
+        self.payload['phonenumber'] = '123'
+        response = self.post_order(**{'Idempotency-Key': 'checkout-1'})
+        self.assertEqual(response.status_code, 400)
+
+        self.payload['phonenumber'] = '+79123456789'
+        response = self.post_order(**{'Idempotency-Key': 'checkout-1'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class PhoneNumberCacheTest(TestCase):
+    def setUp(self):
+        parse_cached.cache_clear()
+
+    def test_order_phone_is_stored_in_e164(self):
+        product = create_products(1)[0]
+        response = self.client.post('/api/order/', {
+            'lastname': 'Петров',
+            'phonenumber': '8 (912) 345-67-89',
+            'address': 'Москва, Красная площадь, 1',
+            'products': [{'product': product.id, 'quantity': 1}],
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['phonenumber'], '+79123456789')
+        self.assertEqual(str(Order.objects.get().phonenumber), '+79123456789')
+
+    def test_repeated_numbers_are_parsed_once(self):
+        for _ in range(3):
+            self.assertEqual(to_e164('8 912 345 67 89', 'RU'), '+79123456789')
+            self.assertIsNone(to_e164('123', 'RU'))
+            self.assertIsNone(to_e164('не телефон', 'RU'))
+
+        self.assertEqual(parse_cached.cache_info().misses, 3)
+
+    def test_loaded_orders_share_parsed_numbers(self):
+        Order.objects.bulk_create([
+            Order(lastname='Петров', phonenumber='+79123456789', address='Москва')
+            for _ in range(5)
+        ])
+        parse_cached.cache_clear()
+
+        orders = list(Order.objects.all())
+        orders[0].phonenumber.extension = '1'
+
+        self.assertEqual(parse_cached.cache_info().misses, 1)
+        self.assertTrue(all(order.phonenumber.is_valid() for order in orders))
+        self.assertEqual(str(orders[1].phonenumber), '+79123456789')
+
+
+class ProductListApiTest(TestCase):
+    def setUp(self):
+        restaurant = Restaurant.objects.create(name='Star Burger')
+        self.product, = create_products(1)
+        RestaurantMenuItem.objects.create(restaurant=restaurant, product=self.product)
+
+    def test_repeat_visit_gets_not_modified(self):
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['id'], self.product.id)
+
+        with self.assertNumQueries(0):
+            repeat_response = self.client.get(
+                '/api/products/',
+                HTTP_IF_NONE_MATCH=response['ETag'],
+            )
+        self.assertEqual(repeat_response.status_code, 304)
+
+    def test_catalog_version_changes_after_commit(self):
+        version = get_version(CATALOG_VERSION)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+            self.assertEqual(get_version(CATALOG_VERSION), version)
+
+        self.assertEqual(get_version(CATALOG_VERSION), version + 1)
+
+    def test_product_change_invalidates_catalog(self):
+        response = self.client.get('/api/products/')
+
+        self.product.name = 'Чизбургер'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+
+        fresh_response = self.client.get(
+            '/api/products/',
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(fresh_response.status_code, 200)
+        self.assertEqual(fresh_response.json()[0]['name'], 'Чизбургер')
+
+
+def make_image(color, size=(800, 600)):
+    output = io.BytesIO()
+    Image.new('RGB', size, color).save(output, 'JPEG')
+    return SimpleUploadedFile('burger.jpg', output.getvalue(), content_type='image/jpeg')
+
+
+class ProductThumbnailTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def test_upload_generates_variants(self):
+        product = Product.objects.create(name='Бургер', price=100, image=make_image('red'))
+
+        self.assertEqual(len(product.image_hash), 32)
+        small = os.path.join(self.media_root, get_thumbnail_path(product.image_hash, 'small', 'webp'))
+        medium = os.path.join(self.media_root, get_thumbnail_path(product.image_hash, 'medium', 'jpeg'))
+        with Image.open(small) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (100, 75)))
+        with Image.open(medium) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (400, 300)))
+
+    def test_same_picture_is_processed_once(self):
+        first = Product.objects.create(name='Бургер', price=100, image=make_image('red'))
+        with patch('foodcartapp.thumbnails.render_thumbnail') as render_thumbnail:
+            second = Product.objects.create(name='Чизбургер', price=120, image=make_image('red'))
+            first.name = 'Гамбургер'
+            first.save()
+        render_thumbnail.assert_not_called()
+        self.assertEqual(first.image_hash, second.image_hash)
+
+        third = Product.objects.create(name='Роял', price=150, image=make_image('blue'))
+        self.assertNotEqual(third.image_hash, first.image_hash)
+
+    def test_unreadable_picture_is_not_decoded_again(self):
+        upload = SimpleUploadedFile('burger.jpg', b'not an image', content_type='image/jpeg')
+        product = Product.objects.create(name='Бургер', price=100, image=upload)
+        self.assertEqual(product.image_hash, UNREADABLE_IMAGE)
+
+        with patch('foodcartapp.thumbnails.read_image') as read_image:
+            product = Product.objects.get(id=product.id)
+            product.name = 'Чизбургер'
+            product.save()
+        read_image.assert_not_called()
+
+    def test_decompression_bomb_is_rejected(self):
+        with patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+            product = Product.objects.create(name='Бургер', price=100, image=make_image('red'))
+
+        self.assertEqual(product.image_hash, UNREADABLE_IMAGE)
+
+    def test_api_exposes_variant_urls(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            restaurant = Restaurant.objects.create(name='Star Burger')
+            product = Product.objects.create(name='Бургер', price=100, image=make_image('red'))
+            RestaurantMenuItem.objects.create(restaurant=restaurant, product=product)
+
+        thumbnails = self.client.get('/api/products/').json()[0]['thumbnails']
+        self.assertEqual(
+            thumbnails['small']['webp'],
+            f'/media/{get_thumbnail_path(product.image_hash, "small", "webp")}',
+        )
+        self.assertEqual(set(thumbnails), {'small', 'medium'})
+
+    def test_variants_are_served_with_long_cache(self):
+        product = Product.objects.create(name='Бургер', price=100, image=make_image('red'))
+        path = get_thumbnail_path(product.image_hash, 'small', 'jpeg').removeprefix('thumbnails/')
+
+        response = serve_thumbnail(
+            RequestFactory().get(f'/media/thumbnails/{path}'),
+            path,
+            document_root=os.path.join(self.media_root, 'thumbnails'),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_command_processes_old_products(self):
+        product = Product.objects.create(name='Бургер', price=100, image=make_image('red'))
+        image_hash = product.image_hash
+        shutil.rmtree(os.path.join(self.media_root, 'thumbnails'))
+        Product.objects.filter(id=product.id).update(image_hash='')
+        catalog_version = get_version(CATALOG_VERSION)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('generate_thumbnails', stdout=io.StringIO())
+
+        product.refresh_from_db()
+        self.assertEqual(product.image_hash, image_hash)
+        self.assertTrue(os.path.exists(
+            os.path.join(self.media_root, get_thumbnail_path(image_hash, 'medium', 'webp'))
+        ))
+        self.assertNotEqual(get_version(CATALOG_VERSION), catalog_version)
+
+
+class AvailableRestaurantsTest(TestCase):
+    def setUp(self):
+        self.burger, self.fries = create_products(2)
+        self.first_restaurant, self.second_restaurant = Restaurant.objects.bulk_create([
+            Restaurant(name='Первый'),
+            Restaurant(name='Второй'),
+        ])
+        RestaurantMenuItem.objects.bulk_create([
+            RestaurantMenuItem(restaurant=self.first_restaurant, product=self.burger),
+            RestaurantMenuItem(restaurant=self.first_restaurant, product=self.fries),
+            RestaurantMenuItem(restaurant=self.second_restaurant, product=self.burger),
+        ])
+        bump_version(AVAILABILITY_VERSION)
+
+        self.order = Order.objects.create(
+            firstname='Иван',
+            lastname='Петров',
+            phonenumber='+79123456789',
+            address='Москва',
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=self.order, product=self.burger, price=100),
+            OrderItem(order=self.order, product=self.fries, price=100),
+        ])
+
+    def get_available_restaurant_ids(self):
+        order, = Order.objects.prefetch_related('items').with_available_restaurants()
+        return order.available_restaurant_ids
+
+    def test_restaurants_selling_every_product(self):
+        self.assertEqual(self.get_available_restaurant_ids(), [self.first_restaurant.id])
+
+    def test_menu_table_is_not_scanned_twice(self):
+        self.get_available_restaurant_ids()
+
+        with self.assertNumQueries(2):
+            self.get_available_restaurant_ids()
+
+    def test_menu_change_updates_index(self):
+        self.get_available_restaurant_ids()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RestaurantMenuItem.objects.create(restaurant=self.second_restaurant, product=self.fries)
+
+        self.assertEqual(
+            sorted(self.get_available_restaurant_ids()),
+            sorted([self.first_restaurant.id, self.second_restaurant.id]),
+        )
+
+
+class AvailabilityMatrixTest(TestCase):
+    def setUp(self):
+        generator = random.Random(0)
+        self.products = create_products(30)
+        self.restaurants = Restaurant.objects.bulk_create([
+            Restaurant(name=f'Ресторан {number:02d}') for number in range(25)
+        ])
+        RestaurantMenuItem.objects.bulk_create([
+            RestaurantMenuItem(
+                restaurant=restaurant,
+                product=product,
+                availability=generator.random() < 0.7,
+            )
+            for restaurant in self.restaurants
+            for product in self.products
+            if generator.random() < 0.8
+        ])
+        bump_version(AVAILABILITY_VERSION)
+
+        manager = User.objects.create_user('manager', password='password', is_staff=True)
+        self.client.force_login(manager)
+
+    def test_matrix_matches_menus(self):
+        available = set(
+            RestaurantMenuItem.objects.filter(availability=True).values_list('restaurant_id', 'product_id')
+        )
+        restaurant_ids = [restaurant.id for restaurant in self.restaurants]
+
+        matrix = get_availability_matrix()
+
+        for product in self.products:
+            self.assertEqual(
+                matrix.get_row(product.id, restaurant_ids),
+                [(restaurant_id, product.id) in available for restaurant_id in restaurant_ids],
+            )
+        self.assertEqual(matrix.get_row(0, restaurant_ids[:2]), [False, False])
+
+    def test_menu_change_rebuilds_matrix(self):
+        item = RestaurantMenuItem.objects.filter(availability=False).first()
+        self.assertFalse(get_availability_matrix().is_available(item.restaurant_id, item.product_id))
+
+        item.availability = True
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+
+        self.assertTrue(get_availability_matrix().is_available(item.restaurant_id, item.product_id))
+
+    @override_settings(MANAGER_PRODUCTS_PAGE_SIZE=10, MANAGER_PRODUCTS_RESTAURANT_COLUMNS=20)
+    def test_products_page_is_paginated(self):
+        self.client.get('/manager/products/')
+
+        with query_budget(6, max_repeats=1):
+            response = self.client.get('/manager/products/', {'page': 3, 'columns': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [product.id for product, availability in response.context['products_with_restaurant_availability']],
+            [product.id for product in self.products[20:]],
+        )
+        self.assertEqual(
+            [restaurant.name for restaurant in response.context['restaurants']],
+            [f'Ресторан {number:02d}' for number in range(20, 25)],
+        )
+        self.assertTrue(all(
+            len(availability) == 5
+            for product, availability in response.context['products_with_restaurant_availability']
+        ))
+
+
+class BulkAvailabilityTest(TestCase):
+    def setUp(self):
+        self.products = create_products(3)
+        self.restaurants = Restaurant.objects.bulk_create([
+            Restaurant(name=f'Ресторан {number}') for number in range(4)
+        ])
+        RestaurantMenuItem.objects.bulk_create([
+            RestaurantMenuItem(restaurant=restaurant, product=product)
+            for restaurant in self.restaurants
+            for product in self.products
+        ])
+        manager = User.objects.create_user('manager', password='password', is_staff=True)
+        self.client.force_login(manager)
+
+    def post_json(self, payload):
+        return self.client.post('/manager/products/availability/', payload, content_type='application/json')
+
+    def test_one_update_and_one_invalidation_per_batch(self):
+        product = self.products[0]
+        self.assertTrue(get_availability_matrix().is_available(self.restaurants[0].id, product.id))
+        catalog_version = get_version(CATALOG_VERSION)
+        availability_version = get_version(AVAILABILITY_VERSION)
+
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            response = self.post_json({'products': [product.id], 'available': False})
+
+        self.assertEqual(response.json(), {'updated': 4})
+        self.assertEqual(sum(query['sql'].startswith('UPDATE') for query in queries), 1)
+        self.assertEqual(get_version(CATALOG_VERSION), catalog_version + 1)
+        self.assertEqual(get_version(AVAILABILITY_VERSION), availability_version + 1)
+        self.assertFalse(any(
+            get_availability_matrix().is_available(restaurant.id, product.id)
+            for restaurant in self.restaurants
+        ))
+        self.assertNotIn(product.id, [item['id'] for item in self.client.get('/api/products/').json()])
+
+    def test_selected_restaurants_only(self):
+        restaurant_ids = [restaurant.id for restaurant in self.restaurants[:2]]
+
+        response = self.post_json({
+            'products': [product.id for product in self.products[:2]],
+            'restaurants': restaurant_ids,
+            'available': False,
+        })
+
+        self.assertEqual(response.json(), {'updated': 4})
+        self.assertEqual(
+            set(RestaurantMenuItem.objects.filter(availability=False).values_list('restaurant_id', flat=True)),
+            set(restaurant_ids),
+        )
+        self.assertEqual(self.post_json({'products': [self.products[0].id], 'available': True}).json(), {'updated': 2})
+
+    def test_products_page_form(self):
+        response = self.client.post('/manager/products/availability/', {
+            'products': [self.products[1].id],
+            'restaurants': [self.restaurants[3].id],
+            'available': 'false',
+            'next': '/manager/products/?page=1',
+        })
+
+        self.assertRedirects(response, '/manager/products/?page=1', fetch_redirect_response=False)
+        item, = RestaurantMenuItem.objects.filter(availability=False)
+        self.assertEqual((item.product_id, item.restaurant_id), (self.products[1].id, self.restaurants[3].id))
+
+    def test_invalid_payload(self):
+        self.assertEqual(self.post_json({'products': [0], 'available': False}).status_code, 400)
+        self.assertEqual(self.post_json([]).status_code, 400)
+        self.assertEqual(self.client.get('/manager/products/availability/').status_code, 405)
+
+
+class YandexGeocoderTest(SimpleTestCase):
+    def start_server(self, places, **kwargs):
+        server = start_stub_geocoder(places, **kwargs)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return YandexGeocoder(
+            'apikey',
+            base_url=f'http://127.0.0.1:{server.server_port}/1.x',
+            backoff=0.01,
+        ), server
+
+    def test_fetch_many_resolves_known_addresses(self):
+        geocoder, server = self.start_server({'Москва': (55.75, 37.62)})
+
+        coordinates = geocoder.fetch_many(['Москва', 'Нигде', 'Москва'])
+
+        self.assertEqual(coordinates, {'Москва': (55.75, 37.62), 'Нигде': None})
+        self.assertEqual(sorted(server.requests), ['Москва', 'Нигде'])
+
+    def test_fetch_many_runs_concurrently(self):
+        addresses = [f'Адрес {number}' for number in range(10)]
+        geocoder, server = self.start_server(
+            {address: (55.0, 37.0) for address in addresses},
+            delay=0.2,
+        )
+
+        coordinates = geocoder.fetch_many(addresses)
+
+        self.assertGreater(server.peak_in_flight, 1)
+        self.assertEqual(set(coordinates.values()), {(55.0, 37.0)})
+
+    def test_retries_server_errors(self):
+        geocoder, server = self.start_server(
+            {'Москва': (55.75, 37.62)},
+            failures={'Москва': 2},
+        )
+
+        self.assertEqual(geocoder.fetch('Москва'), (55.75, 37.62))
+        self.assertEqual(len(server.requests), 3)
+
+    def test_gives_up_after_retries(self):
+        geocoder, server = self.start_server(
+            {'Москва': (55.75, 37.62)},
+            failures={'Москва': 6},
+        )
+
+        with self.assertRaises(GeocoderError):
+            geocoder.fetch('Москва')
+        self.assertEqual(len(server.requests), 3)
+        with self.assertLogs('geocoordapp.geocoder', 'WARNING'):
+            self.assertEqual(geocoder.fetch_many(['Москва', 'Нигде']), {'Нигде': None})
+
+
+class GeocodeQueueTest(TestCase):
+    def setUp(self):
+        server = start_stub_geocoder({'Москва, Тверская, 1': (55.76, 37.61)})
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.geocoder = YandexGeocoder(
+            'apikey',
+            base_url=f'http://127.0.0.1:{server.server_port}/1.x',
+        )
+
+        manager = User.objects.create_user('manager', password='password', is_staff=True)
+        self.client.force_login(manager)
+
+    def create_order(self, address):
+        return Order.objects.create(
+            firstname='Иван',
+            lastname='Петров',
+            phonenumber='+79123456789',
+            address=address,
+        )
+
+    def test_new_order_address_is_queued(self):
+        self.create_order('Москва, Тверская, 1')
+
+        self.assertQuerySetEqual(
+            GeocodeJob.objects.values_list('address', flat=True),
+            ['Москва, Тверская, 1'],
+        )
+
+    def test_dashboard_shows_pending_address_without_geocoding(self):
+        self.create_order('Москва, Тверская, 1')
+
+        response = self.client.get('/manager/orders/accepted/')
+
+        self.assertIn('Адрес определяется', response.json()['html'])
+        self.assertFalse(Place.objects.exists())
+
+    def test_worker_stores_coordinates(self):
+        self.create_order('Москва, Тверская, 1')
+        self.create_order('Нигде')
+
+        self.assertEqual(process_jobs(self.geocoder), 2)
+
+        self.assertFalse(GeocodeJob.objects.exists())
+        self.assertEqual(
+            set(Place.objects.values_list('address', 'lat', 'lon')),
+            {('Москва, Тверская, 1', 55.76, 37.61), ('Нигде', None, None)},
+        )
+        response = self.client.get('/manager/orders/accepted/')
+        self.assertIn('Адрес не найден', response.json()['html'])
+
+    def test_unresolvable_address_is_not_requeued(self):
+        self.create_order('Нигде')
+        process_jobs(self.geocoder)
+
+        self.client.get('/manager/orders/accepted/')
+
+        self.assertFalse(GeocodeJob.objects.exists())
+
+    def test_geocoder_errors_keep_jobs_queued(self):
+        Place.objects.create(address='Москва, Тверская, 1', lat=55.0, lon=37.0)
+        Place.objects.filter(address='Москва, Тверская, 1').update(updated_at=timezone.now() - timedelta(days=60))
+        place = Place.objects.get(address='Москва, Тверская, 1')
+        queue_jobs(['Москва, Тверская, 1'])
+        server = start_stub_geocoder(
+            {'Москва, Тверская, 1': (55.76, 37.61)},
+            failures={'Москва, Тверская, 1': 3},
+        )
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        geocoder = YandexGeocoder(
+            'apikey',
+            base_url=f'http://127.0.0.1:{server.server_port}/1.x',
+            backoff=0.01,
+        )
+
+        with self.assertLogs('geocoordapp.geocoder', 'WARNING'):
+            process_jobs(geocoder, lease=timedelta(0))
+
+        self.assertTrue(GeocodeJob.objects.exists())
+        unchanged_place = Place.objects.get(id=place.id)
+        self.assertEqual(
+            (unchanged_place.failures, unchanged_place.updated_at, unchanged_place.coordinates),
+            (0, place.updated_at, (55.0, 37.0)),
+        )
+
+        self.assertEqual(process_jobs(geocoder), 1)
+        self.assertFalse(GeocodeJob.objects.exists())
+        self.assertEqual(Place.objects.get(id=place.id).coordinates, (55.76, 37.61))
+
+    @override_settings(GEOCODE_NEGATIVE_TTL=0)
+    def test_unresolvable_address_is_retried_after_negative_ttl(self):
+        self.create_order('Нигде')
+        process_jobs(self.geocoder)
+
+        self.client.get('/manager/orders/accepted/')
+        process_jobs(self.geocoder)
+
+        self.assertEqual(Place.objects.get(address='Нигде').failures, 2)
+
+    @override_settings(GEOCODE_TTL=0)
+    def test_stale_coordinates_are_used_while_refreshing(self):
+        self.create_order('Москва, Тверская, 1')
+        process_jobs(self.geocoder)
+
+        html = self.client.get('/manager/orders/accepted/').json()['html']
+
+        self.assertNotIn('Адрес определяется', html)
+        self.assertNotIn('Адрес не найден', html)
+        self.assertTrue(GeocodeJob.objects.filter(address='Москва, Тверская, 1').exists())
+
+
+class AddressNormalizationTest(TestCase):
+    def test_address_spellings_share_place(self):
+        Place.objects.record_result('ул. Ленина 5', (55.0, 37.0))
+
+        lookup = Place.objects.lookup(['улица Ленина, д. 5 ', 'УЛ ЛЕНИНА 5', 'ул. Ленина 7'])
+
+        self.assertEqual(
+            {address: status for address, (status, place) in lookup.items()},
+            {
+                'улица Ленина, д. 5 ': Place.FRESH,
+                'УЛ ЛЕНИНА 5': Place.FRESH,
+                'ул. Ленина 7': Place.MISSING,
+            },
+        )
+
+    def test_command_merges_duplicates(self):
+        Place.objects.bulk_create([
+            Place(address='ул. Ленина 5', lat=55.0, lon=37.0),
+            Place(address='улица Ленина, 5', failures=3),
+            Place(address='ул. Ленина 7', lat=56.0, lon=38.0),
+        ])
+
+        call_command('normalize_places', stdout=io.StringIO())
+
+        self.assertEqual(
+            set(Place.objects.values_list('address', 'normalized_address')),
+            {
+                ('ул. Ленина 5', 'улица ленина 5'),
+                ('ул. Ленина 7', 'улица ленина 7'),
+            },
+        )
+
+
+class DistanceMatrixTest(SimpleTestCase):
+    orders = [(55.7558, 37.6173), (59.9343, 30.3351)]
+    restaurants = [(55.7512, 37.6184), (55.7963, 37.5376), (59.9386, 30.3141)]
+
+    def test_matches_geodesic(self):
+        distances = distance_matrix(self.orders, self.restaurants)
+
+        self.assertEqual(distances.shape, (2, 3))
+        for row, order in enumerate(self.orders):
+            for column, restaurant in enumerate(self.restaurants):
+                self.assertAlmostEqual(
+                    distances[row, column],
+                    geodesic(order, restaurant).km,
+                    delta=geodesic(order, restaurant).km * 0.005,
+                )
+
+    def test_ties_are_resolved_exactly(self):
+        order = (55.7558, 37.6173)
+        north, east = (55.7658, 37.6173), (55.7558, 37.6350)
+
+        distances = distance_matrix([order], [north, east], exact_ties=True)
+
+        self.assertAlmostEqual(distances[0, 0], geodesic(order, north).km)
+        self.assertAlmostEqual(distances[0, 1], geodesic(order, east).km)
+
+    def test_empty_input(self):
+        self.assertEqual(distance_matrix([], self.restaurants).shape, (0, 3))
+
+
+class RestaurantLocatorTest(SimpleTestCase):
+    def setUp(self):
+        generator = random.Random(42)
+        self.points = {
+            restaurant_id: (generator.uniform(55.5, 56), generator.uniform(37.3, 37.9))
+            for restaurant_id in range(300)
+        }
+        self.locator = RestaurantLocator(self.points)
+        self.order_point = (55.75, 37.62)
+
+    def brute_force(self, k, among):
+        distances = [
+            (geodesic(self.order_point, self.points[restaurant_id]).km, restaurant_id)
+            for restaurant_id in among
+        ]
+        return [restaurant_id for distance, restaurant_id in sorted(distances)[:k]]
+
+    def test_nearest_matches_full_scan(self):
+        nearest = self.locator.nearest(self.order_point, k=5)
+
+        self.assertEqual(
+            [restaurant_id for restaurant_id, distance in nearest],
+            self.brute_force(5, self.points),
+        )
+
+    def test_nearest_among_stocking_restaurants(self):
+        among = list(range(0, 300, 3)) + [1000]
+
+        nearest = self.locator.nearest(self.order_point, k=3, among=among)
+
+        self.assertEqual(
+            [restaurant_id for restaurant_id, distance in nearest],
+            self.brute_force(3, among[:-1]),
+        )
+        for restaurant_id, distance in nearest:
+            self.assertAlmostEqual(
+                distance,
+                geodesic(self.order_point, self.points[restaurant_id]).km,
+                delta=distance * 0.005,
+            )
+
+
+class RestaurantLocationsInvalidationTest(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurant = Restaurant.objects.create(name='Star Burger', address='Москва, Тверская, 1')
+        get_restaurant_locator()
+
+    def test_order_places_keep_index(self):
+        version = get_version(LOCATIONS_VERSION)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Place.objects.record_result('Москва, Арбат, 1', (55.75, 37.59))
+
+        self.assertEqual(get_version(LOCATIONS_VERSION), version)
+
+    def test_restaurant_place_changes_rebuild_index(self):
+        version = get_version(LOCATIONS_VERSION)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Place.objects.record_result('москва тверская 1', (55.76, 37.61))
+        self.assertEqual(get_version(LOCATIONS_VERSION), version + 1)
+        self.assertIn(self.restaurant.id, get_restaurant_locator())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Place.objects.record_result('Москва, Тверская, 1', (55.76, 37.61))
+        self.assertEqual(get_version(LOCATIONS_VERSION), version + 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Place.objects.all().delete()
+        self.assertEqual(get_version(LOCATIONS_VERSION), version + 2)
+        self.assertNotIn(self.restaurant.id, get_restaurant_locator())
+
+
+def seed_dashboard(orders_count, restaurants_count, products_count=20, seed=0):
+    """Create located restaurants with random menus and accepted orders around Moscow."""
+    generator = random.Random(seed)
+    products = create_products(products_count)
+
+    restaurants = Restaurant.objects.bulk_create([
+        Restaurant(name=f'Ресторан {number}', address=f'Москва, ресторан {number}')
+        for number in range(restaurants_count)
+    ])
+    RestaurantMenuItem.objects.bulk_create([
+        RestaurantMenuItem(restaurant=restaurant, product=product)
+        for restaurant in restaurants
+        for product in products
+        if generator.random() < 0.8
+    ])
+
+    orders = Order.objects.bulk_create([
+        Order(
+            firstname='Иван',
+            lastname='Петров',
+            phonenumber='+79123456789',
+            address=f'Москва, заказ {number}',
+        )
+        for number in range(orders_count)
+    ])
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=product, price=product.price)
+        for order in orders
+        for product in generator.sample(products, 3)
+    ])
+
+    addresses = [restaurant.address for restaurant in restaurants]
+    addresses += [order.address for order in orders]
+    Place.objects.bulk_create([
+        Place(
+            address=address,
+            normalized_address=normalize_address(address),
+            lat=generator.uniform(55.5, 56),
+            lon=generator.uniform(37.3, 37.9),
+        )
+        for address in addresses
+    ])
+
+    bump_version(AVAILABILITY_VERSION)
+    bump_version(LOCATIONS_VERSION)
+
+
+class OrderDashboardScalingTest(TestCase):
+    def measure(self, orders_count):
+        Order.objects.all().delete()
+        Restaurant.objects.all().delete()
+        Product.objects.all().delete()
+        Place.objects.all().delete()
+        seed_dashboard(orders_count, restaurants_count=200)
+
+        with CaptureQueriesContext(connection) as queries:
+            section = build_order_section('accepted')
+
+        self.assertEqual(len(section.rows), orders_count)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_orders(self):
+        # Timing of the same section lives in `benchmark_site`
+        self.assertEqual(self.measure(100), self.measure(1000))
+
+
+class OrderSectionTest(TestCase):
+    def setUp(self):
+        manager = User.objects.create_user('manager', password='password', is_staff=True)
+        self.client.force_login(manager)
+        self.restaurant = Restaurant.objects.create(name='Star Burger')
+
+        registered_at = timezone.now() - timedelta(hours=1)
+        self.orders = Order.objects.bulk_create([
+            Order(
+                firstname='Иван',
+                lastname=f'Петров {number}',
+                phonenumber='+79123456789',
+                address='Москва',
+                status='in_progress',
+                payment_method='cash' if number % 2 else 'web_cash',
+                restaurant=self.restaurant if number < 4 else None,
+                registered_at=registered_at,
+            )
+            for number in range(7)
+        ])
+
+    def get_section(self, **params):
+        response = self.client.get('/manager/orders/in_progress/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    @override_settings(MANAGER_ORDERS_PAGE_SIZE=3)
+    def test_keyset_pages_cover_every_order_once(self):
+        seen_ids = []
+        cursor = None
+        while True:
+            params = {'cursor': cursor} if cursor else {}
+            section = self.get_section(**params)
+            seen_ids += [int(order_id) for order_id in re.findall(r'data-order-id="(\d+)"', section['html'])]
+            cursor = section['next']
+            if not cursor:
+                break
+
+        self.assertEqual(seen_ids, [order.id for order in self.orders])
+
+    def test_filters(self):
+        section = self.get_section(restaurant=self.restaurant.id, payment_method='cash')
+
+        self.assertEqual(section['html'].count('data-order-id'), 2)
+        self.assertEqual(self.get_section(older_than=120)['html'].strip(), '')
+
+    def test_dashboard_page_does_not_load_orders(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/manager/orders/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('foodcartapp_order' in query['sql'] for query in queries))
+
+    def test_section_query_budget(self):
+        with query_budget(5, max_repeats=1):
+            self.get_section()
+
+
+class OrderTotalsTest(TestCase):
+    def setUp(self):
+        burger, = create_products(1)
+        self.order = Order.objects.create(
+            firstname='Иван',
+            lastname='Петров',
+            phonenumber='+79123456789',
+            address='Москва',
+        )
+        OrderItem.objects.create(order=self.order, product=burger, quantity=3, price=150)
+
+    def test_update_total_price(self):
+        self.order.update_total_price()
+
+        self.assertEqual(Order.objects.get().total_price, 450)
+
+    def test_check_command_reports_and_fixes_mismatch(self):
+        with self.assertRaises(CommandError):
+            call_command('check_order_totals', stdout=io.StringIO())
+
+        updated_at = Order.objects.get().updated_at
+        call_command('check_order_totals', '--fix', stdout=io.StringIO())
+
+        order = Order.objects.get()
+        self.assertEqual(order.total_price, 450)
+        self.assertGreater(order.updated_at, updated_at)
+        call_command('check_order_totals', stdout=io.StringIO())
+
+
+class OrderAdminTest(TestCase):
+    def setUp(self):
+        self.products = create_products(30)
+        self.restaurant = Restaurant.objects.create(name='Star Burger')
+        self.order = Order.objects.create(
+            firstname='Иван',
+            lastname='Петров',
+            phonenumber='+79123456789',
+            address='Москва',
+            status='in_progress',
+            payment_method='cash',
+            restaurant=self.restaurant,
+        )
+        admin_user = User.objects.create_superuser('admin', password='password')
+        self.client.force_login(admin_user)
+
+    def get_form_data(self, rows):
+        """Build the change form POST: rows are (item or None, product, quantity, delete)."""
+        registered_at = timezone.localtime(self.order.registered_at)
+        data = {
+            'firstname': self.order.firstname,
+            'lastname': self.order.lastname,
+            'phonenumber': str(self.order.phonenumber),
+            'address': self.order.address,
+            'status': self.order.status,
+            'payment_method': self.order.payment_method,
+            'comment': '',
+            'registered_at_0': registered_at.strftime('%Y-%m-%d'),
+            'registered_at_1': registered_at.strftime('%H:%M:%S'),
+            'restaurant': self.restaurant.id,
+            'items-TOTAL_FORMS': len(rows),
+            'items-INITIAL_FORMS': sum(item is not None for item, *_ in rows),
+            'items-MIN_NUM_FORMS': 0,
+            'items-MAX_NUM_FORMS': 1000,
+        }
+        for number, (item, product, quantity, delete) in enumerate(rows):
+            prefix = f'items-{number}'
+            data.update({
+                f'{prefix}-id': item.id if item else '',
+                f'{prefix}-order': self.order.id,
+                f'{prefix}-product': product.id,
+                f'{prefix}-quantity': quantity,
+            })
+            if delete:
+                data[f'{prefix}-DELETE'] = 'on'
+        return data
+
+    def save(self, rows):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                f'/admin/foodcartapp/order/{self.order.id}/change/',
+                self.get_form_data(rows),
+            )
+        self.assertEqual(response.status_code, 302, response.context and response.context['errors'])
+        return len(queries)
+
+    def test_items_are_saved_in_batches(self):
+        self.save([])
+        small_queries = self.save([(None, product, 1, False) for product in self.products[:2]])
+        self.order.items.all().delete()
+        large_queries = self.save([(None, product, 1, False) for product in self.products])
+
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(self.order.items.count(), 30)
+
+    def test_prices_total_and_load_follow_edits(self):
+        first, second, third = self.products[:3]
+        self.save([(None, first, 1, False), (None, second, 2, False)])
+        first_item = self.order.items.get(product=first)
+        second_item = self.order.items.get(product=second)
+        Product.objects.filter(id=third.id).update(price=1000)
+
+        self.save([
+            (first_item, first, 1, True),
+            (second_item, third, 3, False),
+        ])
+
+        self.assertEqual(
+            list(self.order.items.values_list('product_id', 'quantity', 'price')),
+            [(third.id, 3, 1000)],
+        )
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_price, 3000)
+        self.assertEqual(RestaurantLoad.objects.get(restaurant=self.restaurant).items_in_progress, 3)
+
+    def test_standalone_item_admin_updates_total_and_load(self):
+        first, second = self.products[:2]
+        self.save([(None, first, 1, False), (None, second, 2, False)])
+        item = self.order.items.get(product=first)
+
+        response = self.client.post(f'/admin/foodcartapp/orderitem/{item.id}/change/', {
+            'order': self.order.id,
+            'product': first.id,
+            'quantity': 4,
+            'price': first.price,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_price, first.price * 4 + second.price * 2)
+        self.assertEqual(RestaurantLoad.objects.get(restaurant=self.restaurant).items_in_progress, 6)
+
+        response = self.client.post('/admin/foodcartapp/orderitem/', {
+            'action': 'delete_selected',
+            '_selected_action': [item.id],
+            'post': 'yes',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_price, second.price * 2)
+        self.assertEqual(RestaurantLoad.objects.get(restaurant=self.restaurant).items_in_progress, 2)
+
+
+class AdminChangelistTest(TestCase):
+    def setUp(self):
+        admin_user = User.objects.create_superuser('admin', password='password')
+        self.client.force_login(admin_user)
+
+    def create_orders(self, count):
+        products = create_products(2)
+        restaurants = Restaurant.objects.bulk_create([
+            Restaurant(name=f'Ресторан {number}') for number in range(count)
+        ])
+        orders = Order.objects.bulk_create([
+            Order(
+                lastname='Петров',
+                phonenumber='+79123456789',
+                address='Москва',
+                status='in_delivery',
+                restaurant=restaurant,
+            )
+            for restaurant in restaurants
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, price=product.price)
+            for order in orders
+            for product in products
+        ])
+
+    def count_queries(self, url):
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelists_do_not_query_per_row(self):
+        self.create_orders(2)
+        small_queries = [
+            self.count_queries('/admin/foodcartapp/order/'),
+            self.count_queries('/admin/foodcartapp/orderitem/'),
+        ]
+
+        self.create_orders(20)
+
+        self.assertEqual(small_queries, [
+            self.count_queries('/admin/foodcartapp/order/'),
+            self.count_queries('/admin/foodcartapp/orderitem/'),
+        ])
+
+    def test_order_change_page_does_not_query_per_item(self):
+        self.create_orders(1)
+        order = Order.objects.get()
+        url = f'/admin/foodcartapp/order/{order.id}/change/'
+        small_queries = self.count_queries(url)
+
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, price=product.price)
+            for product in create_products(10)
+        ])
+
+        self.assertEqual(self.count_queries(url), small_queries)
+
+    @patch.object(ApproximateCountPaginator, 'count_limit', 5)
+    def test_count_is_capped(self):
+        self.create_orders(8)
+
+        response = self.client.get('/admin/foodcartapp/orderitem/')
+
+        self.assertEqual(response.context['cl'].result_count, 5)
+        self.assertFalse(any(
+            'COUNT(*)' in query['sql'] and 'LIMIT' not in query['sql']
+            for query in self.capture_changelist_queries('/admin/foodcartapp/orderitem/')
+        ))
+        self.assertEqual(
+            self.client.get('/admin/foodcartapp/order/', {'status__exact': 'accepted'}).context['cl'].result_count,
+            0,
+        )
+
+    def capture_changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return queries
+
+
+@override_settings(MANAGER_FEED_TIMEOUT=0)
+class OrderFeedTest(TestCase):
+    def setUp(self):
+        manager = User.objects.create_user('manager', password='password', is_staff=True)
+        self.client.force_login(manager)
+        self.since = timezone.now()
+
+    def get_feed(self, since):
+        response = self.client.get('/manager/orders/feed/', {'since': since.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_streams_new_and_changed_orders(self):
+        order = Order.objects.create(
+            firstname='Иван',
+            lastname='Петров',
+            phonenumber='+79123456789',
+            address='Москва',
+        )
+
+        feed = self.get_feed(self.since)
+        update, = feed['orders']
+        self.assertEqual((update['id'], update['status']), (order.id, 'accepted'))
+        self.assertIn(f'data-order-id="{order.id}"', update['html'])
+
+        order.status = 'completed'
+        order.save()
+
+        update, = self.get_feed(datetime.fromisoformat(feed['cursor']))['orders']
+        self.assertEqual((update['id'], update['status'], update['html']), (order.id, 'completed', None))
+
+    def test_streams_deleted_orders(self):
+        order = Order.objects.create(
+            firstname='Иван',
+            lastname='Петров',
+            phonenumber='+79123456789',
+            address='Москва',
+        )
+        cursor = datetime.fromisoformat(self.get_feed(self.since)['cursor'])
+        order_id = order.id
+        order.delete()
+
+        feed = self.get_feed(cursor)
+
+        update, = feed['orders']
+        self.assertEqual((update['id'], update['html']), (order_id, None))
+        self.assertEqual(self.get_feed(datetime.fromisoformat(feed['cursor']))['orders'], [])
+
+    def test_no_changes(self):
+        feed = self.get_feed(self.since)
+
+        self.assertEqual(feed['orders'], [])
+        self.assertEqual(feed['cursor'], self.since.isoformat())
+
+
+class AssignmentTest(TestCase):
+    def test_plan_respects_capacity_and_menus(self):
+        restaurant_points = {1: (55.75, 37.60), 2: (55.90, 37.60)}
+        order_points = {10: (55.751, 37.60), 11: (55.752, 37.60), 12: (55.753, 37.60)}
+        candidates = {10: [1, 2], 11: [1, 2], 12: [2]}
+
+        assignments = plan_assignments(order_points, candidates, restaurant_points, capacity=1)
+
+        self.assertEqual(assignments, {10: 1, 12: 2})
+
+    def test_plan_counts_current_load(self):
+        assignments = plan_assignments(
+            {10: (55.751, 37.60)},
+            {10: [1, 2]},
+            {1: (55.75, 37.60), 2: (55.90, 37.60)},
+            capacity=2,
+            loads={1: 2},
+        )
+
+        self.assertEqual(assignments, {10: 2})
+
+    def test_plan_penalizes_busy_restaurants(self):
+        order_points = {10: (55.751, 37.60)}
+        candidates = {10: [1, 2]}
+        restaurant_points = {1: (55.75, 37.60), 2: (55.76, 37.60)}
+
+        idle_first = plan_assignments(
+            order_points, candidates, restaurant_points, capacity=10, loads={1: 3},
+        )
+        busy_avoided = plan_assignments(
+            order_points, candidates, restaurant_points, capacity=10, loads={1: 3},
+            load_penalty=0.5,
+        )
+
+        self.assertEqual(idle_first, {10: 1})
+        self.assertEqual(busy_avoided, {10: 2})
+
+    def test_assign_orders(self):
+        seed_dashboard(orders_count=30, restaurants_count=5)
+
+        assigned_count = assign_orders(capacity=4)
+
+        self.assertEqual(assigned_count, Order.objects.filter(status='in_progress').count())
+        self.assertLessEqual(assigned_count, 20)
+        self.assertFalse(Order.objects.filter(status='in_progress', restaurant__isnull=True).exists())
+        for order in Order.objects.filter(status='in_progress').prefetch_related('items'):
+            self.assertTrue(all(
+                RestaurantMenuItem.objects.filter(
+                    restaurant=order.restaurant_id,
+                    product=item.product_id,
+                    availability=True,
+                ).exists()
+                for item in order.items.all()
+            ))
+
+
+class RestaurantLoadTest(TestCase):
+    def setUp(self):
+        self.restaurant = Restaurant.objects.create(name='Ресторан', address='Москва, ресторан')
+        product = create_products(1)[0]
+        self.order = Order.objects.create(
+            firstname='Иван',
+            lastname='Петров',
+            phonenumber='+79123456789',
+            address='Москва, заказ',
+        )
+        OrderItem.objects.create(order=self.order, product=product, quantity=3, price=product.price)
+
+    def get_load(self):
+        load = RestaurantLoad.objects.filter(restaurant=self.restaurant).first()
+        return (load.orders_in_progress, load.items_in_progress) if load else (0, 0)
+
+    def test_status_changes_move_load(self):
+        order = Order.objects.get(id=self.order.id)
+        order.restaurant = self.restaurant
+        order.status = 'in_progress'
+        order.save()
+        self.assertEqual(self.get_load(), (1, 3))
+
+        order.save()
+        self.assertEqual(self.get_load(), (1, 3))
+
+        order = Order.objects.get(id=self.order.id)
+        order.status = 'in_delivery'
+        order.save()
+        self.assertEqual(self.get_load(), (0, 0))
+
+    def test_delete_releases_load(self):
+        order = Order.objects.get(id=self.order.id)
+        order.restaurant = self.restaurant
+        order.status = 'in_progress'
+        order.save()
+
+        Order.objects.get(id=self.order.id).delete()
+
+        self.assertEqual(self.get_load(), (0, 0))
+
+    def test_deferred_fields_order_releases_load(self):
+        Order.objects.filter(id=self.order.id).update(status='in_progress', restaurant=self.restaurant)
+        recount_restaurant_loads()
+        self.assertEqual(self.get_load(), (1, 3))
+
+        order = Order.objects.only('id').get(id=self.order.id)
+        order.status = 'in_delivery'
+        order.save()
+        self.assertEqual(self.get_load(), (0, 0))
+
+        order = Order.objects.defer('status').get(id=self.order.id)
+        order.status = 'in_progress'
+        order.save()
+        self.assertEqual(self.get_load(), (1, 3))
+
+        Order.objects.defer('restaurant').get(id=self.order.id).delete()
+        self.assertEqual(self.get_load(), (0, 0))
+
+    def test_assign_orders_matches_recount(self):
+        seed_dashboard(orders_count=30, restaurants_count=5)
+        assign_orders(capacity=4)
+        counters = {
+            load.restaurant_id: (load.orders_in_progress, load.items_in_progress)
+            for load in RestaurantLoad.objects.all()
+        }
+
+        recount_restaurant_loads()
+
+        self.assertEqual(counters, {
+            load.restaurant_id: (load.orders_in_progress, load.items_in_progress)
+            for load in RestaurantLoad.objects.all()
+        })
+        self.assertEqual(
+            sum(orders for orders, items in counters.values()),
+            Order.objects.filter(status='in_progress').count(),
+        )
+
+
+class BenchmarkTest(TransactionTestCase):
+    # benchmark_site runs in autocommit, where cache versions are bumped on commit
+    def test_run_benchmark_reports_every_scenario(self):
+        results = run_benchmark(
+            restaurants_count=3,
+            products_count=5,
+            orders_count=20,
+            customers_count=5,
+            requests_count=3,
+            warmup=1,
+        )
+
+        self.assertEqual(
+            set(results['scenarios']),
+            {'api_products', 'api_order', 'manager_orders', 'manager_orders_accepted'},
+        )
+        for result in results['scenarios'].values():
+            self.assertEqual(result['requests'], 3)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+        self.assertGreater(results['scenarios']['api_order']['queries_mean'], 0)
+        small, large = results['order_section_scaling']
+        self.assertLess(small['rows'], large['rows'])
+        self.assertEqual(small['queries'], large['queries'])
+        self.assertEqual(Order.objects.count(), 20 + 4)
+        self.assertEqual(Place.objects.filter(lat__isnull=False).count(), 3 + 5)
+
+
+@override_settings(METRICS_TOKEN='secret', METRICS_SAMPLE_RATE=1)
+class MetricsTest(TestCase):
+    def setUp(self):
+        reset_metrics()
+
+    def get_metrics(self, token='secret'):
+        return self.client.get('/metrics/', headers={'Authorization': f'Bearer {token}'})
+
+    def test_metrics_require_token(self):
+        self.assertEqual(self.get_metrics(token='wrong').status_code, 401)
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.get_metrics().status_code, 404)
+
+    def test_sampled_requests_are_measured(self):
+        create_products(3)
+        self.client.get('/api/products/')
+        self.client.get('/api/products/')
+
+        response = self.get_metrics()
+
+        self.assertEqual(response.status_code, 200)
+        metrics = response.content.decode()
+        view = 'view="foodcartapp:foodcartapp.views.product_list_api"'
+        self.assertIn(f'starburger_requests_total{{status="200",{view}}} 2.0', metrics)
+        self.assertIn(f'starburger_request_duration_seconds_count{{{view}}} 2.0', metrics)
+        self.assertIn(f'starburger_request_db_queries_bucket{{le="+Inf",{view}}} 2.0', metrics)
+        self.assertIn(f'starburger_response_size_bytes_count{{{view}}} 2.0', metrics)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_only_counted(self):
+        self.client.get('/api/products/')
+
+        metrics = self.get_metrics().content.decode()
+
+        self.assertIn('starburger_requests_total{status="200",view="foodcartapp:foodcartapp.views.product_list_api"} 1.0', metrics)
+        self.assertNotIn('starburger_request_duration_seconds_count', metrics)
+
+    def test_geocoder_calls_are_measured(self):
+        server = start_stub_geocoder({'Москва, Тверская, 1': (55.76, 37.61)})
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        geocoder = YandexGeocoder('apikey', base_url=f'http://127.0.0.1:{server.server_port}/1.x')
+
+        geocoder.fetch_many(['Москва, Тверская, 1', 'Москва, Арбат, 1'])
+
+        self.assertIn(
+            'starburger_geocoder_request_duration_seconds_count{outcome="200"} 2.0',
+            self.get_metrics().content.decode(),
+        )
+
+    def test_samples_of_all_processes_are_summed(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        script = (
+            'import django; django.setup(); '
+            'from star_burger.metrics import GEOCODER_REQUEST_DURATION; '
+            "GEOCODER_REQUEST_DURATION.labels(outcome='200').observe(0.1)"
+        )
+        environment = {
+            **os.environ,
+            'PROMETHEUS_MULTIPROC_DIR': directory,
+            'DJANGO_SETTINGS_MODULE': 'star_burger.settings',
+        }
+        for worker in range(2):
+            subprocess.run([sys.executable, '-c', script], env=environment, cwd=settings.BASE_DIR, check=True)
+
+        with patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}):
+            metrics = self.get_metrics().content.decode()
+
+        self.assertIn('starburger_geocoder_request_duration_seconds_count{outcome="200"} 2.0', metrics)
+
+    def test_metrics_server_listens_on_localhost(self):
+        server, thread = start_metrics_server(0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        self.assertEqual(server.server_address[0], '127.0.0.1')
+
+
+class QueryInspectionTest(TestCase):
+    def test_fingerprint_ignores_literals(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x'  LIMIT 21"),
+            fingerprint('SELECT * FROM t WHERE id IN (%s) AND name = %s LIMIT 1'),
+        )
+
+    def test_budget_reports_repeated_queries(self):
+        products = create_products(3)
+
+        with self.assertRaisesRegex(AssertionError, r'3 × SELECT .*restaurateur/tests\.py:\d+'):
+            with query_budget(10, max_repeats=2):
+                for product in products:
+                    Product.objects.get(id=product.id)
+
+        with self.assertRaisesRegex(AssertionError, '3 queries executed, budget is 2'):
+            with query_budget(2):
+                for product in products:
+                    Product.objects.get(id=product.id)
+
+    def test_call_site_skips_other_execute_wrappers(self):
+        products = create_products(3)
+
+        with self.assertRaisesRegex(AssertionError, r'3 × SELECT .*restaurateur/tests\.py:\d+'):
+            with connection.execute_wrapper(QueryTimer()), query_budget(10, max_repeats=2):
+                for product in products:
+                    Product.objects.get(id=product.id)
+
+    @override_settings(QUERY_INSPECTION_SAMPLE_RATE=1, QUERY_REPEAT_THRESHOLD=3, SLOW_QUERY_MS=0)
+    def test_middleware_logs_n_plus_one(self):
+        products = create_products(3)
+
+        def view(request):
+            for product in products[:int(request.GET.get('count', 3))]:
+                Product.objects.get(id=product.id)
+            return HttpResponse()
+
+        middleware = QueryInspectionMiddleware(view)
+        with self.assertNoLogs('star_burger.queries'):
+            middleware(RequestFactory().get('/menu/', {'count': 2}))
+
+        with self.assertLogs('star_burger.queries', 'WARNING') as logs:
+            middleware(RequestFactory().get('/menu/'))
+
+        message, = logs.output
+        self.assertIn('Possible N+1 in GET /menu/: 3 × SELECT', message)
+        self.assertRegex(message, r'restaurateur/tests\.py:\d+ in view')
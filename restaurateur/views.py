@@ -1,18 +1,28 @@
+import json
+import time
+from datetime import datetime
+
 from django import forms
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse
 from django.shortcuts import redirect, render
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.views import View
-from django.urls import reverse_lazy
+from django.views.decorators.http import require_POST
+from django.urls import reverse, reverse_lazy
 from django.contrib.auth.decorators import user_passes_test
 
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
 
-from foodcartapp.models import Product, Restaurant, Order
-from geocoordapp.models import Place
-from geocoordapp.views import fetch_coordinates
-from geopy.distance import geodesic
+from foodcartapp.availability import get_availability_matrix, set_availability
+from foodcartapp.caching import ORDERS_VERSION, get_version
+from foodcartapp.models import Order, Product, Restaurant
 
-from star_burger import settings
+from .dashboard import SECTION_STATUSES, build_order_section, build_order_updates
 
 
 class Login(forms.Form):
@@ -32,6 +42,32 @@ class Login(forms.Form):
     )
 
 
+class OrderFilter(forms.Form):
+    restaurant = forms.ModelChoiceField(
+        label='Ресторан', required=False, empty_label='Все рестораны',
+        queryset=Restaurant.objects.order_by('name'),
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    payment_method = forms.ChoiceField(
+        label='Способ оплаты', required=False,
+        choices=[('', 'Любой способ оплаты'), *Order.PAYMENT_METHOD],
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    older_than = forms.IntegerField(
+        label='Старше, мин.', required=False, min_value=1,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Старше, мин.'
+        })
+    )
+
+
+class AvailabilityForm(forms.Form):
+    products = forms.ModelMultipleChoiceField(queryset=Product.objects.all())
+    restaurants = forms.ModelMultipleChoiceField(queryset=Restaurant.objects.all(), required=False)
+    available = forms.BooleanField(required=False)
+
+
 class LoginView(View):
     def get(self, request, *args, **kwargs):
         form = Login()
@@ -69,116 +105,144 @@ def is_manager(user):
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_products(request):
-    restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
-
-    products_with_restaurant_availability = []
-    for product in products:
-        availability = {item.restaurant_id: item.availability for item in product.menu_items.all()}
-        ordered_availability = [availability.get(restaurant.id, False) for restaurant in restaurants]
-
-        products_with_restaurant_availability.append(
-            (product, ordered_availability)
-        )
+    restaurants_page = Paginator(
+        Restaurant.objects.order_by('name', 'id').only('id', 'name'),
+        settings.MANAGER_PRODUCTS_RESTAURANT_COLUMNS,
+    ).get_page(request.GET.get('columns'))
+    products_page = Paginator(
+        Product.objects.select_related('category').order_by('id'),
+        settings.MANAGER_PRODUCTS_PAGE_SIZE,
+    ).get_page(request.GET.get('page'))
+
+    matrix = get_availability_matrix()
+    restaurant_ids = [restaurant.id for restaurant in restaurants_page]
+    products_with_restaurant_availability = [
+        (product, matrix.get_row(product.id, restaurant_ids))
+        for product in products_page
+    ]
 
     return render(request, template_name="products_list.html", context={
         'products_with_restaurant_availability': products_with_restaurant_availability,
-        'restaurants': restaurants,
+        'restaurants': restaurants_page,
+        'products_page': products_page,
+        'restaurants_page': restaurants_page,
     })
 
 
+@require_POST
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def update_availability(request):
+    """Switch products on or off in many restaurant menus at once.
+
+    Accepts JSON `{"products": [...], "restaurants": [...], "available": bool}`
+    or the products page form. Without restaurants every menu is changed.
+    """
+    is_json = request.content_type == 'application/json'
+    if is_json:
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Некорректный JSON'}, status=400)
+    else:
+        data = request.POST
+
+    form = AvailabilityForm(data)
+    if not form.is_valid():
+        if is_json:
+            return JsonResponse({'errors': form.errors}, status=400)
+        return redirect('restaurateur:ProductsView')
+
+    restaurants = form.cleaned_data['restaurants']
+    updated_count = set_availability(
+        [product.id for product in form.cleaned_data['products']],
+        form.cleaned_data['available'],
+        restaurant_ids=[restaurant.id for restaurant in restaurants] if restaurants else None,
+    )
+
+    if is_json:
+        return JsonResponse({'updated': updated_count})
+
+    next_url = request.POST.get('next', '')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = reverse('restaurateur:ProductsView')
+    return redirect(next_url)
+
+
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_restaurants(request):
     return render(request, template_name="restaurants_list.html", context={
-        'restaurants': Restaurant.objects.all(),
+        'restaurants': Restaurant.objects.select_related('load'),
     })
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_orders(request):
-    orders = Order.objects.total_price().filter(
-        status='accepted'
-    ).prefetch_related(
-        'items__product'
-    ).select_related(
-        'restaurant'
-    ).with_available_restaurants()
-
-    restaurants = Restaurant.objects.all()
-
-    all_addresses = set()
-    for order in orders:
-        all_addresses.add(order.address)
-        for restaurant_id in getattr(order, 'available_restaurant_ids', []):
-            restaurant = next((r for r in restaurants if r.id == restaurant_id), None)
-            if restaurant:
-                all_addresses.add(restaurant.address)
-
-    places = Place.objects.filter(address__in=all_addresses)
-    existing_places = {place.address: place for place in places}
-
-    missing_addresses = [address for address in all_addresses
-                         if address not in existing_places or
-                         not existing_places[address].lat or
-                         not existing_places[address].lon]
-
-    for address in missing_addresses:
-        coordinates = fetch_coordinates(settings.GEOAPP_TOKEN, address)
-        if coordinates:
-            lat, lon = coordinates
-            place, created = Place.objects.get_or_create(address=address)
-            place.lat = lat
-            place.lon = lon
-            place.save()
-            existing_places[address] = place
-        else:
-            place, created = Place.objects.get_or_create(address=address)
-            existing_places[address] = place
-
-    places_dict = existing_places
-
-    for order in orders:
-        order.available_restaurants = []
-        order.address_not_found = False
-
-        order_place = places_dict.get(order.address)
-        if not order_place or not order_place.lat or not order_place.lon:
-            order.address_not_found = True
-        else:
-            for restaurant_id in getattr(order, 'available_restaurant_ids', []):
-                restaurant = next((r for r in restaurants if r.id == restaurant_id), None)
-                if not restaurant:
-                    continue
-
-                restaurant_place = places_dict.get(restaurant.address)
-
-                if not restaurant_place or not restaurant_place.lat or not restaurant_place.lon:
-                    distance = 'адрес ресторана не найден'
-                    order.available_restaurants.append({restaurant.name: distance})
-                else:
-                    distance = round(geodesic(
-                        (order_place.lat, order_place.lon),
-                        (restaurant_place.lat, restaurant_place.lon)
-                    ).km, 2)
-                    order.available_restaurants.append({restaurant.name: distance})
-
-            order.available_restaurants = sorted(order.available_restaurants, key=lambda x: (
-                0, list(x.values())[0]) if isinstance(list(x.values())[0], (int, float)) else (
-                1, str(list(x.values())[0])))
-
-    orders_in_progress = Order.objects.total_price().filter(status='in_progress').select_related(
-        'restaurant'
-    )
-    orders_in_delivery = Order.objects.total_price().filter(status='in_delivery').select_related(
-        'restaurant'
-    )
+    return render(request, template_name='order_items.html', context={
+        'filter_form': OrderFilter(request.GET),
+        'sections': SECTION_STATUSES,
+        'feed_cursor': timezone.now().isoformat(),
+    })
 
-    return render(
-        request,
-        template_name='order_items.html',
-        context={
-            'order_items': orders,
-            'order_in_progress': orders_in_progress,
-            'order_in_delivery': orders_in_delivery
-        }
-    )
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_order_section(request, status):
+    if status not in SECTION_STATUSES:
+        raise Http404
+
+    filter_form = OrderFilter(request.GET)
+    if not filter_form.is_valid():
+        return JsonResponse({'errors': filter_form.errors}, status=400)
+
+    try:
+        section = build_order_section(
+            status,
+            filters=filter_form.cleaned_data,
+            cursor=request.GET.get('cursor'),
+            limit=settings.MANAGER_ORDERS_PAGE_SIZE,
+        )
+    except ValueError:
+        return JsonResponse({'errors': {'cursor': ['Некорректный курсор']}}, status=400)
+
+    html = render_to_string('order_rows.html', request=request, context={
+        'status': status,
+        'rows': section.rows,
+        'dashboard_url': reverse('restaurateur:view_orders'),
+    })
+    return JsonResponse({'html': html, 'next': section.next_cursor})
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_order_feed(request):
+    try:
+        since = datetime.fromisoformat(request.GET['since'])
+    except (KeyError, ValueError):
+        return JsonResponse({'errors': {'since': ['Некорректная дата']}}, status=400)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+
+    deadline = time.monotonic() + settings.MANAGER_FEED_TIMEOUT
+    cursor, updates = build_order_updates(since)
+    while not updates and time.monotonic() < deadline:
+        version = get_version(ORDERS_VERSION)
+        while get_version(ORDERS_VERSION) == version and time.monotonic() < deadline:
+            time.sleep(settings.MANAGER_FEED_POLL_INTERVAL)
+        cursor, updates = build_order_updates(since)
+
+    dashboard_url = reverse('restaurateur:view_orders')
+    return JsonResponse({
+        'cursor': cursor.isoformat(),
+        'orders': [
+            {
+                'id': update.id,
+                'status': update.status,
+                'html': render_to_string('order_rows.html', request=request, context={
+                    'status': update.status,
+                    'rows': [update.row],
+                    'dashboard_url': dashboard_url,
+                }) if update.row else None,
+            }
+            for update in updates
+        ],
+    })
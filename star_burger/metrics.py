@@ -0,0 +1,160 @@
+import hmac
+import os
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+
+DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+QUERY_COUNT_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100, 200]
+SIZE_BUCKETS = [256, 1024, 4096, 16384, 65536, 262144, 1048576]
+
+REQUESTS = Counter(
+    'starburger_requests',
+    'Requests served, by view and status code.',
+    ['view', 'status'],
+)
+REQUEST_DURATION = Histogram(
+    'starburger_request_duration_seconds',
+    'Wall time of sampled requests.',
+    ['view'],
+    buckets=DURATION_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    'starburger_request_db_queries',
+    'Database queries per sampled request.',
+    ['view'],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    'starburger_request_db_duration_seconds',
+    'Time spent in the database per sampled request.',
+    ['view'],
+    buckets=DURATION_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'starburger_response_size_bytes',
+    'Body size of sampled non-streaming responses.',
+    ['view'],
+    buckets=SIZE_BUCKETS,
+)
+GEOCODER_REQUEST_DURATION = Histogram(
+    'starburger_geocoder_request_duration_seconds',
+    'Latency of HTTP calls to the geocoder, by outcome.',
+    ['outcome'],
+    buckets=DURATION_BUCKETS,
+)
+
+METRICS = [
+    REQUESTS,
+    REQUEST_DURATION,
+    REQUEST_QUERIES,
+    REQUEST_DB_DURATION,
+    RESPONSE_SIZE,
+    GEOCODER_REQUEST_DURATION,
+]
+
+
+def get_registry():
+    """Return the registry to export.
+
+    With PROMETHEUS_MULTIPROC_DIR set every process, web workers and
+    geocode_worker alike, writes its samples there and the export sums them.
+    Otherwise only the metrics of the current process are exported.
+    """
+    if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def reset_metrics():
+    for metric in METRICS:
+        metric.clear()
+
+
+def start_metrics_server(port, addr='127.0.0.1'):
+    """Serve /metrics over plain HTTP for processes without a web endpoint.
+
+    The server has no token check, so it only listens on localhost unless
+    another address is given.
+    """
+    return start_http_server(port, addr=addr, registry=get_registry())
+
+
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started_at
+
+
+def get_view_name(request):
+    resolver_match = getattr(request, 'resolver_match', None)
+    return resolver_match.view_name if resolver_match else '<unmatched>'
+
+
+class MetricsMiddleware:
+    """Count every request and measure a METRICS_SAMPLE_RATE share of them in detail."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            response = self.get_response(request)
+            REQUESTS.labels(view=get_view_name(request), status=response.status_code).inc()
+            return response
+
+        query_timer = QueryTimer()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_timer))
+            started_at = time.perf_counter()
+            response = self.get_response(request)
+            duration = time.perf_counter() - started_at
+
+        view = get_view_name(request)
+        REQUESTS.labels(view=view, status=response.status_code).inc()
+        REQUEST_DURATION.labels(view=view).observe(duration)
+        REQUEST_QUERIES.labels(view=view).observe(query_timer.count)
+        REQUEST_DB_DURATION.labels(view=view).observe(query_timer.duration)
+        if not response.streaming:
+            RESPONSE_SIZE.labels(view=view).observe(len(response.content))
+        return response
+
+
+def metrics_view(request):
+    """Serve the metrics to a scraper holding METRICS_TOKEN."""
+    if not settings.METRICS_TOKEN:
+        raise Http404
+
+    expected = f'Bearer {settings.METRICS_TOKEN}'.encode()
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected):
+        response = HttpResponse(status=401)
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
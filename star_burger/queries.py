@@ -0,0 +1,173 @@
+import logging
+import random
+import re
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+VALUE_LIST = re.compile(r'\((?:\s*%s\s*,)*\s*%s\s*\)')
+WHITESPACE = re.compile(r'\s+')
+
+PROJECT_ROOT = Path(settings.BASE_DIR).resolve()
+THIS_FILE = Path(__file__).resolve()
+EXECUTE_WRAPPER_ARGUMENTS = ('execute', 'sql', 'params', 'many', 'context')
+
+
+def fingerprint(sql):
+    """Reduce SQL to its shape: literals and IN lists of any length look the same."""
+    sql = STRING_LITERAL.sub('%s', sql)
+    sql = NUMBER_LITERAL.sub('%s', sql)
+    sql = VALUE_LIST.sub('(...)', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+def is_execute_wrapper(code):
+    arguments = code.co_varnames[:code.co_argcount]
+    return arguments[-len(EXECUTE_WRAPPER_ARGUMENTS):] == EXECUTE_WRAPPER_ARGUMENTS
+
+
+def find_call_site():
+    """Return `path:line in function` of the innermost project frame outside this module.
+
+    Other execute wrappers, like the metrics query timer, are skipped too.
+    """
+    frame = sys._getframe(1)
+    while frame:
+        path = Path(frame.f_code.co_filename).resolve()
+        if (
+            path.is_relative_to(PROJECT_ROOT)
+            and path != THIS_FILE
+            and 'site-packages' not in path.parts
+            and not is_execute_wrapper(frame.f_code)
+        ):
+            return f'{path.relative_to(PROJECT_ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return '<unknown>'
+
+
+class QueryShape:
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.duration = 0
+        self.call_site = None
+
+
+class QueryInspector:
+    """Execute wrapper grouping queries by fingerprint.
+
+    The call site is looked up only for queries that repeat `repeat_threshold`
+    times or run longer than `slow_query_seconds`, so ordinary queries cost a
+    regex pass and a dict lookup.
+    """
+
+    def __init__(self, repeat_threshold=0, slow_query_seconds=0):
+        self.repeat_threshold = repeat_threshold
+        self.slow_query_seconds = slow_query_seconds
+        self.shapes = {}
+        self.slow_queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started_at
+            key = fingerprint(sql)
+            shape = self.shapes.get(key)
+            if shape is None:
+                shape = self.shapes[key] = QueryShape(key)
+            shape.count += 1
+            shape.duration += duration
+
+            if self.repeat_threshold and shape.count == self.repeat_threshold:
+                shape.call_site = find_call_site()
+            if self.slow_query_seconds and duration >= self.slow_query_seconds:
+                self.slow_queries.append((sql, duration, find_call_site()))
+
+    @property
+    def total_count(self):
+        return sum(shape.count for shape in self.shapes.values())
+
+    def get_repeated(self):
+        return [
+            shape for shape in self.shapes.values()
+            if self.repeat_threshold and shape.count >= self.repeat_threshold
+        ]
+
+    def describe(self):
+        shapes = sorted(self.shapes.values(), key=lambda shape: -shape.count)
+        return '\n'.join(
+            f'{shape.count} × {shape.sql}' + (f'  ({shape.call_site})' if shape.call_site else '')
+            for shape in shapes
+        )
+
+
+@contextmanager
+def inspect_queries(repeat_threshold=0, slow_query_seconds=0):
+    inspector = QueryInspector(repeat_threshold, slow_query_seconds)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(inspector))
+        yield inspector
+
+
+class QueryInspectionMiddleware:
+    """Log repeated query shapes (likely N+1) and slow queries of sampled requests."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        repeat_threshold = settings.QUERY_REPEAT_THRESHOLD
+        slow_query_seconds = settings.SLOW_QUERY_MS / 1000
+        if (
+            not (repeat_threshold or slow_query_seconds)
+            or random.random() >= settings.QUERY_INSPECTION_SAMPLE_RATE
+        ):
+            return self.get_response(request)
+
+        with inspect_queries(repeat_threshold, slow_query_seconds) as inspector:
+            response = self.get_response(request)
+
+        for shape in inspector.get_repeated():
+            logger.warning(
+                'Possible N+1 in %s %s: %d × %s at %s',
+                request.method, request.path, shape.count, shape.sql, shape.call_site,
+            )
+        for sql, duration, call_site in inspector.slow_queries:
+            logger.warning(
+                'Slow query in %s %s: %.0f ms %s at %s',
+                request.method, request.path, duration * 1000, fingerprint(sql), call_site,
+            )
+        return response
+
+
+@contextmanager
+def query_budget(budget, max_repeats=None):
+    """Fail the block if it runs more than `budget` queries or repeats a shape too often.
+
+        with query_budget(5, max_repeats=1):
+            self.client.get('/manager/orders/accepted/')
+    """
+    with inspect_queries(repeat_threshold=max_repeats + 1 if max_repeats is not None else 0) as inspector:
+        yield inspector
+
+    if inspector.total_count > budget:
+        raise AssertionError(
+            f'{inspector.total_count} queries executed, budget is {budget}:\n{inspector.describe()}'
+        )
+    repeated = inspector.get_repeated()
+    if repeated:
+        raise AssertionError(
+            f'Query shapes repeated more than {max_repeats} times:\n{inspector.describe()}'
+        )
@@ -12,6 +12,15 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 GEOAPP_TOKEN = env('GEOAPP_TOKEN')
+GEOCODER_URL = env('GEOCODER_URL', 'https://geocode-maps.yandex.ru/1.x')
+GEOCODER_TIMEOUT = env.float('GEOCODER_TIMEOUT', 5)
+GEOCODER_MAX_WORKERS = env.int('GEOCODER_MAX_WORKERS', 10)
+GEOCODER_RATE_LIMIT = env.float('GEOCODER_RATE_LIMIT', 0)
+GEOCODER_RETRIES = env.int('GEOCODER_RETRIES', 2)
+GEOCODER_BACKOFF = env.float('GEOCODER_BACKOFF', 0.5)
+GEOCODE_TTL = env.int('GEOCODE_TTL', 30 * 24 * 60 * 60)
+GEOCODE_NEGATIVE_TTL = env.int('GEOCODE_NEGATIVE_TTL', 60 * 60)
+GEOCODE_NEGATIVE_TTL_MAX = env.int('GEOCODE_NEGATIVE_TTL_MAX', 7 * 24 * 60 * 60)
 SECRET_KEY = env('SECRET_KEY')
 DEBUG = env.bool('DEBUG', False)
 
@@ -32,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'star_burger.metrics.MetricsMiddleware',
+    'star_burger.queries.QueryInspectionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,6 +99,32 @@ DATABASES = {
     )
 }
 
+CACHES = {
+    'default': env.dj_cache_url('CACHE_URL', 'locmem://'),
+}
+
+CATALOG_CACHE_TIMEOUT = env.int('CATALOG_CACHE_TIMEOUT', 24 * 60 * 60)
+AVAILABILITY_CACHE_TIMEOUT = env.int('AVAILABILITY_CACHE_TIMEOUT', 24 * 60 * 60)
+MANAGER_NEAREST_RESTAURANTS = env.int('MANAGER_NEAREST_RESTAURANTS', 5)
+MANAGER_ORDERS_PAGE_SIZE = env.int('MANAGER_ORDERS_PAGE_SIZE', 50)
+MANAGER_PRODUCTS_PAGE_SIZE = env.int('MANAGER_PRODUCTS_PAGE_SIZE', 50)
+MANAGER_PRODUCTS_RESTAURANT_COLUMNS = env.int('MANAGER_PRODUCTS_RESTAURANT_COLUMNS', 20)
+ASSIGNMENT_RESTAURANT_CAPACITY = env.int('ASSIGNMENT_RESTAURANT_CAPACITY', 10)
+RESTAURANT_LOAD_PENALTY_KM = env.float('RESTAURANT_LOAD_PENALTY_KM', 0.5)
+
+ORDER_IDEMPOTENCY_TTL = env.int('ORDER_IDEMPOTENCY_TTL', 24 * 60 * 60)
+ORDER_DUPLICATE_WINDOW = env.int('ORDER_DUPLICATE_WINDOW', 120)
+
+MANAGER_FEED_TIMEOUT = env.float('MANAGER_FEED_TIMEOUT', 25)
+MANAGER_FEED_POLL_INTERVAL = env.float('MANAGER_FEED_POLL_INTERVAL', 1)
+
+METRICS_TOKEN = env('METRICS_TOKEN', '')
+METRICS_SAMPLE_RATE = env.float('METRICS_SAMPLE_RATE', 0.1)
+
+QUERY_INSPECTION_SAMPLE_RATE = env.float('QUERY_INSPECTION_SAMPLE_RATE', 0.1)
+QUERY_REPEAT_THRESHOLD = env.int('QUERY_REPEAT_THRESHOLD', 10)
+SLOW_QUERY_MS = env.int('SLOW_QUERY_MS', 200)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
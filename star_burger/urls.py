@@ -14,20 +14,31 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 
 """
+import os
+
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from django.shortcuts import render
 
+from foodcartapp.thumbnails import THUMBNAILS_DIR
+from foodcartapp.views import serve_thumbnail
+
 from . import settings
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', render, kwargs={'template_name': 'index.html'}, name='start_page'),
     path('api/', include('foodcartapp.urls')),
     path('manager/', include('restaurateur.urls')),
+    path('metrics/', metrics_view, name='metrics'),
 
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+] + static(
+    f'{settings.MEDIA_URL}{THUMBNAILS_DIR}/',
+    view=serve_thumbnail,
+    document_root=os.path.join(settings.MEDIA_ROOT, THUMBNAILS_DIR),
+) + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
 if settings.DEBUG:
     import debug_toolbar